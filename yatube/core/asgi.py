@@ -0,0 +1,257 @@
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import close_old_connections, connections
+
+
+class BodyTooLarge(Exception):
+    """Тело запроса больше ASGI_MAX_BODY_SIZE."""
+
+
+def build_environ(scope, body):
+    """WSGI environ из ASGI scope: дальше запрос идёт обычным путём Django."""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # PEP 3333: пути в environ — байты UTF-8, прочитанные как latin-1.
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        value = value.decode('latin-1')
+        if name in environ:
+            value = f'{environ[name]},{value}'
+        environ[name] = value
+    return environ
+
+
+class ASGIHandler:
+    """ASGI-приложение поверх синхронного обработчика Django.
+
+    Медленные клиенты обслуживаются в цикле событий: тело запроса
+    принимается и ответ отправляется без участия потоков. Сам запрос
+    (middleware, view, ORM) выполняется в пуле из ASGI_THREADS потоков,
+    так что поток занят только пока работает Django. Генератор потокового
+    ответа шагает в собственном потоке ответа и останавливается, когда
+    клиент отключается. Потоки SSE (pubsub.EventStreamResponse) ждут
+    событий прямо в цикле событий и потоков не занимают.
+    """
+
+    def __init__(self):
+        self.wsgi = WSGIHandler()
+        self.pool = ThreadPoolExecutor(
+            max_workers=settings.ASGI_THREADS, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f'Unsupported ASGI scope {scope["type"]!r}')
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.pool.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, scope, receive):
+        """Тело запроса; крупное уходит на диск, как у upload-хендлеров.
+
+        Больше ASGI_MAX_BODY_SIZE не принимаем: по Content-Length отказ
+        сразу, без него — как только пришло лишнее.
+        """
+        limit = settings.ASGI_MAX_BODY_SIZE
+        for name, value in scope.get('headers', ()):
+            if name.lower() == b'content-length' and value.isdigit() and (
+                    int(value) > limit):
+                raise BodyTooLarge
+        body = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        received = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            chunk = message.get('body', b'')
+            received += len(chunk)
+            if received > limit:
+                body.close()
+                raise BodyTooLarge
+            body.write(chunk)
+            if not message.get('more_body', False):
+                body.seek(0)
+                return body
+
+    def run_wsgi(self, environ):
+        """Запрос через Django в потоке пула.
+
+        Обычный ответ закрывается здесь же: request_finished закрывает
+        соединения с БД того потока, где они открылись. Потоковый ответ
+        закроет поток, в котором шагает его генератор.
+        """
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        response = self.wsgi(environ, start_response)
+        if response.streaming:
+            close_old_connections()
+        else:
+            response.close()
+        return response, started
+
+    async def wait_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    def close_stream(self, response):
+        response.close()
+        connections.close_all()
+
+    async def stream(self, response, started, send, disconnected):
+        """Отдать потоковый ответ, пока клиент на связи.
+
+        Генератор может держать курсор БД (.iterator()), поэтому все его
+        шаги и close() идут в одном отдельном потоке этого ответа. Отправка
+        ждёт клиента вне потоков; отключение клиента останавливает поток.
+        """
+        loop = asyncio.get_running_loop()
+        thread = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='asgi-stream')
+        chunks = iter(response)
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': started['status'],
+                'headers': started['headers'],
+            })
+            while True:
+                step = loop.run_in_executor(thread, next, chunks, None)
+                await asyncio.wait(
+                    (step, disconnected),
+                    return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    return
+                chunk = step.result()
+                if chunk is None:
+                    break
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+            await send({'type': 'http.response.body'})
+        finally:
+            # Исполнитель однопоточный: close() выполнится после
+            # незавершённого шага, а не параллельно с ним.
+            await loop.run_in_executor(thread, self.close_stream, response)
+            thread.shutdown(wait=False)
+
+    async def stream_events(self, response, started, send, disconnected):
+        """Поток SSE целиком в цикле событий: ожидание не держит потоков."""
+        chunks = response.async_chunks()
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': started['status'],
+                'headers': started['headers'],
+            })
+            while True:
+                step = asyncio.ensure_future(chunks.__anext__())
+                await asyncio.wait(
+                    (step, disconnected),
+                    return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    step.cancel()
+                    await asyncio.wait((step,))
+                    return
+                try:
+                    chunk = step.result()
+                except StopAsyncIteration:
+                    break
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+            await send({'type': 'http.response.body'})
+        finally:
+            await chunks.aclose()
+            await asyncio.get_running_loop().run_in_executor(
+                self.pool, response.close)
+
+    async def http(self, scope, receive, send):
+        try:
+            body = await self.read_body(scope, receive)
+        except BodyTooLarge:
+            await send({
+                'type': 'http.response.start',
+                'status': 413,
+                'headers': [(b'content-type', b'text/plain; charset=utf-8')],
+            })
+            await send({
+                'type': 'http.response.body',
+                'body': 'Слишком большой запрос.'.encode(),
+            })
+            return
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            response, started = await loop.run_in_executor(
+                self.pool, self.run_wsgi, build_environ(scope, body))
+        finally:
+            body.close()
+        if not response.streaming:
+            await send({
+                'type': 'http.response.start',
+                'status': started['status'],
+                'headers': started['headers'],
+            })
+            await send({
+                'type': 'http.response.body',
+                'body': response.content,
+            })
+            return
+        disconnected = asyncio.ensure_future(self.wait_disconnect(receive))
+        stream = (
+            self.stream_events if hasattr(response, 'async_chunks')
+            else self.stream
+        )
+        try:
+            await stream(response, started, send, disconnected)
+        finally:
+            disconnected.cancel()
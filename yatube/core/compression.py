@@ -0,0 +1,141 @@
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_max_age, patch_vary_headers
+
+from .storage import brotli
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript',
+    'application/xml', 'application/atom+xml', 'image/svg+xml',
+)
+# Для ответов на лету: уровень 6 gzip и качество 5 brotli дают почти
+# всё сжатие за малую долю времени максимальных уровней.
+GZIP_LEVEL: int = 6
+BROTLI_QUALITY: int = 5
+CACHE_PREFIX: str = 'compressed'
+# В порядке предпочтения; brotli — только если модуль установлен.
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def quality(params):
+    """q из параметров кодировки; без q или с испорченным q — 1."""
+    for param in params:
+        key, _, value = param.partition('=')
+        if key.strip().lower() == 'q':
+            try:
+                return float(value.strip())
+            except ValueError:
+                return 1.0
+    return 1.0
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме запрещённых через q=0."""
+    encodings = set()
+    for item in header.split(','):
+        name, *params = item.split(';')
+        if quality(params) == 0:
+            continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+def choose_encoding(header, available=SUPPORTED_ENCODINGS):
+    """Первая из available, которую принимает клиент, или None."""
+    accepted = accepted_encodings(header)
+    return next(
+        (encoding for encoding in available if encoding in accepted), None)
+
+
+class Compressor:
+    """Единый интерфейс поверх zlib (gzip) и brotli."""
+
+    def __init__(self, encoding):
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress = self.compressor.process
+            self.sync = self.compressor.flush
+            self.finish = self.compressor.finish
+        else:
+            # wbits=31: поток в формате gzip, а не голый deflate.
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.compress = self.compressor.compress
+            self.sync = lambda: self.compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.finish = self.compressor.flush
+
+
+def compress(content, encoding):
+    compressor = Compressor(encoding)
+    return compressor.compress(content) + compressor.finish()
+
+
+def compress_stream(chunks, encoding):
+    """Сжимать по мере отдачи; каждый кусок сразу уходит клиенту."""
+    compressor = Compressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.sync()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """Сжатие ответов brotli или gzip по Accept-Encoding.
+
+    Ответы короче COMPRESSION_MIN_SIZE и уже сжатые форматы не трогаем.
+    Если ответ кэшируемый (есть max-age, как у cache_page), сжатый вариант
+    кладётся в кэш по хешу содержимого: повторная выдача той же страницы
+    из кэша не сжимает её заново.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = settings.COMPRESSION_MIN_SIZE
+        self.cache = caches[settings.COMPRESSION_CACHE_ALIAS]
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # События SSE мелкие, а поток под ASGI отдаётся мимо middleware.
+        if (response.has_header('Content-Encoding')
+                or response.get('Content-Type', '').startswith(
+                    'text/event-stream')
+                or not response.get('Content-Type', '').startswith(
+                    COMPRESSIBLE_TYPES)
+                or (not response.streaming
+                    and len(response.content) < self.min_size)):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            response.content = self.compressed_content(response, encoding)
+            response['Content-Length'] = str(len(response.content))
+
+        # Сжатое тело отличается побайтно: строгий ETag становится слабым.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    def compressed_content(self, response, encoding):
+        max_age = get_max_age(response)
+        if not max_age:
+            return compress(response.content, encoding)
+        digest = hashlib.sha1(response.content).hexdigest()
+        key = f'{CACHE_PREFIX}:{encoding}:{digest}'
+        content = self.cache.get(key)
+        if content is None:
+            content = compress(response.content, encoding)
+            self.cache.set(key, content, max_age)
+        return content
@@ -0,0 +1,83 @@
+import base64
+from email.message import Message
+from email.mime.base import MIMEBase
+from email.parser import BytesParser
+
+from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.core.mail.backends.base import BaseEmailBackend
+
+
+class ParsedMIMEPart(MIMEBase):
+    """MIMEBase, который может собрать email.parser из готовых байтов."""
+
+    def __init__(self, policy=None):
+        if policy is None:
+            Message.__init__(self)
+        else:
+            Message.__init__(self, policy)
+
+
+def serialize_message(message):
+    """EmailMessage -> словарь, пригодный для JSON.
+
+    Вложения-кортежи хранятся как (имя, base64, тип), готовые MIMEBase —
+    как {"mime": base64 всей части с заголовками}.
+    """
+    attachments = []
+    for attachment in message.attachments:
+        if isinstance(attachment, MIMEBase):
+            attachments.append({
+                'mime': base64.b64encode(attachment.as_bytes()).decode()})
+            continue
+        filename, content, mimetype = attachment
+        if isinstance(content, str):
+            content = content.encode()
+        attachments.append(
+            (filename, base64.b64encode(content).decode(), mimetype))
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'alternatives': getattr(message, 'alternatives', []),
+        'attachments': attachments,
+    }
+
+
+def deserialize_message(data):
+    alternatives = data.pop('alternatives', [])
+    attachments = data.pop('attachments', [])
+    message = EmailMultiAlternatives(**data) if alternatives else (
+        EmailMessage(**data))
+    for content, mimetype in alternatives:
+        message.attach_alternative(content, mimetype)
+    for attachment in attachments:
+        if isinstance(attachment, dict):
+            message.attach(BytesParser(ParsedMIMEPart).parsebytes(
+                base64.b64decode(attachment['mime'])))
+            continue
+        filename, content, mimetype = attachment
+        message.attach(filename, base64.b64decode(content), mimetype)
+    return message
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Кладёт письма в очередь задач вместо отправки в запросе.
+
+    Отправляет воркер через settings.QUEUED_EMAIL_BACKEND.
+    """
+
+    def send_messages(self, email_messages):
+        from .tasks import deliver_emails
+
+        messages = [
+            serialize_message(message) for message in email_messages
+            if message.recipients()
+        ]
+        if messages:
+            deliver_emails.delay(messages)
+        return len(messages)
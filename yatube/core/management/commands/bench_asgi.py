@@ -0,0 +1,89 @@
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from core.asgi import ASGIHandler, build_environ
+
+
+class Command(BaseCommand):
+    help = (
+        'Медленные клиенты: WSGI с пулом потоков против yatube.asgi. '
+        'Задержка клиента имитирует медленную отправку запроса и чтение '
+        'ответа.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument('--delay', type=float, default=0.05)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--path', default='/about/author/')
+
+    def scope(self, path):
+        return {
+            'type': 'http',
+            'method': 'GET',
+            'path': path,
+            'headers': [(b'host', b'localhost')],
+            'server': ('localhost', 80),
+            'client': ('127.0.0.1', 50000),
+        }
+
+    def run_wsgi(self, options):
+        """Поток держит соединение всё время, как gthread-воркер."""
+        handler = WSGIHandler()
+        scope = self.scope(options['path'])
+
+        def client():
+            time.sleep(options['delay'])
+            response = handler(
+                build_environ(scope, io.BytesIO()), lambda *args: None)
+            b''.join(response)
+            response.close()
+            time.sleep(options['delay'])
+
+        with ThreadPoolExecutor(options['threads']) as pool:
+            for future in [
+                pool.submit(client) for _ in range(options['clients'])
+            ]:
+                future.result()
+
+    def run_asgi(self, options):
+        scope = self.scope(options['path'])
+
+        async def client(handler):
+            async def receive():
+                await asyncio.sleep(options['delay'])
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                if (message['type'] == 'http.response.body'
+                        and not message.get('more_body')):
+                    await asyncio.sleep(options['delay'])
+
+            await handler(scope, receive, send)
+
+        async def main():
+            handler = ASGIHandler()
+            await asyncio.gather(
+                *(client(handler) for _ in range(options['clients'])))
+            handler.pool.shutdown()
+
+        asyncio.run(main())
+
+    def handle(self, *args, **options):
+        with override_settings(ASGI_THREADS=options['threads']):
+            for label, run in (('WSGI', self.run_wsgi),
+                               ('ASGI', self.run_asgi)):
+                started = time.perf_counter()
+                run(options)
+                total = time.perf_counter() - started
+                self.stdout.write(
+                    f'{label}: {options["clients"]} клиентов за '
+                    f'{total:.2f} с, {options["clients"] / total:.0f} '
+                    f'запросов/с'
+                )
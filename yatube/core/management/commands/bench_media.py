@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.views.static import serve
+
+from core.media import serve_media
+
+
+def consume(response):
+    size = sum(len(chunk) for chunk in response.streaming_content)
+    response.close()
+    return size
+
+
+class Command(BaseCommand):
+    help = 'Пропускная способность отдачи больших картинок из MEDIA_ROOT.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        root = tempfile.mkdtemp()
+        try:
+            os.makedirs(os.path.join(root, 'posts'))
+            with open(os.path.join(root, 'posts', 'big.jpg'), 'wb') as file:
+                file.write(os.urandom(options['size_mb'] * 1024 * 1024))
+            with override_settings(MEDIA_ROOT=root, MEDIA_SENDFILE=None):
+                self.run_cases(root, options)
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    def run_cases(self, root, options):
+        factory = RequestFactory()
+        half = options['size_mb'] * 1024 * 1024 // 2
+        cases = (
+            ('django.views.static.serve', lambda: consume(serve(
+                factory.get('/'), 'posts/big.jpg', document_root=root))),
+            ('serve_media', lambda: consume(serve_media(
+                factory.get('/'), 'posts/big.jpg'))),
+            ('serve_media Range 1/2', lambda: consume(serve_media(
+                factory.get('/', HTTP_RANGE=f'bytes={half}-'),
+                'posts/big.jpg'))),
+        )
+        for label, case in cases:
+            size = case()
+            total = timeit.timeit(case, number=options['repeat'])
+            megabytes = size * options['repeat'] / total / 1024 / 1024
+            self.stdout.write(
+                f'{label:>26}: {total / options["repeat"] * 1e3:.1f} мс, '
+                f'{megabytes:.0f} МБ/с'
+            )
@@ -0,0 +1,42 @@
+import timeit
+from importlib import import_module
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.signed_cookies',
+)
+
+
+class Command(BaseCommand):
+    help = 'Замер загрузки сессии на запрос для разных SESSION_ENGINE.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for engine in ENGINES:
+            store_class = import_module(engine).SessionStore
+            session = store_class()
+            session['_auth_user_id'] = '1'
+            session.save()
+            key = session.session_key
+
+            def load():
+                store_class(session_key=key).load()
+
+            load()
+            with CaptureQueriesContext(connection) as queries:
+                load()
+            total = timeit.timeit(load, number=options['repeat'])
+            session.delete()
+            self.stdout.write(
+                f'{engine.rsplit(".", 1)[-1]:>15}: '
+                f'{total / options["repeat"] * 1e6:.1f} мкс, '
+                f'запросов к БД: {len(queries)}'
+            )
@@ -0,0 +1,156 @@
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+# Миниатюры sorl лежат под именами-хешами и не меняются.
+IMMUTABLE_PREFIXES = ('cache/',)
+IMMUTABLE_MAX_AGE: int = 365 * 24 * 60 * 60
+MEDIA_MAX_AGE: int = 24 * 60 * 60
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class MediaFileResponse(FileResponse):
+    """FileResponse с блоком 64 КБ вместо 4 КБ, если нет wsgi.file_wrapper."""
+
+    block_size = 64 * 1024
+
+
+class RangeReader:
+    """Читает из открытого файла не больше length байт начиная с start."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """Вернуть (start, end) включительно, None без Range или ValueError.
+
+    Поддерживается один диапазон; на несколько отдаётся весь файл,
+    что RFC 7233 разрешает.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def file_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def sendfile_response(path, name):
+    """Отдать файл прокси: nginx (X-Accel-Redirect) или Apache (X-Sendfile)."""
+    response = HttpResponse()
+    if settings.MEDIA_SENDFILE == 'X-Accel-Redirect':
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + name
+    else:
+        response['X-Sendfile'] = path
+    # Тип и длину выставит прокси по самому файлу.
+    del response['Content-Type']
+    return response
+
+
+def weak(etag):
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def not_modified(request, etag, last_modified):
+    """If-None-Match (список, *, слабое сравнение) или If-Modified-Since."""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        tags = {weak(tag.strip()) for tag in if_none_match.split(',')}
+        return '*' in tags or weak(etag) in tags
+    if_modified_since = parse_http_date_safe(
+        request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return bool(if_modified_since) and if_modified_since >= last_modified
+
+
+def file_response(request, full_path, size, etag):
+    content_type = (
+        mimetypes.guess_type(full_path)[0] or 'application/octet-stream')
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = MediaFileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = MediaFileResponse(
+            RangeReader(file, start, end - start + 1),
+            content_type=content_type, status=206)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Картинки постов и миниатюры из MEDIA_ROOT.
+
+    Поддерживает Range, If-None-Match/If-Modified-Since и передачу файла
+    прокси через MEDIA_SENDFILE; иначе отвечает FileResponse, который
+    WSGI-сервер отдаёт через sendfile.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    if not path.startswith(settings.MEDIA_SERVE_PREFIXES):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+    if not_modified(request, etag, last_modified):
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_SENDFILE:
+        response = sendfile_response(full_path, path)
+    else:
+        response = file_response(request, full_path, stat.st_size, etag)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    max_age = (IMMUTABLE_MAX_AGE if path.startswith(IMMUTABLE_PREFIXES)
+               else MEDIA_MAX_AGE)
+    response['Cache-Control'] = f'public, max-age={max_age}'
+    return response
@@ -0,0 +1,290 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import Http404, StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+# Сколько последних сообщений канала хранится для переподключений.
+HISTORY: int = 100
+CACHE_PREFIX: str = 'pubsub'
+MESSAGE_TIMEOUT: int = 10 * 60
+MAX_CHANNELS: int = 10000
+
+
+class LocalBackend:
+    """Каналы в памяти процесса: годится, пока узел один.
+
+    Каналов столько же, сколько постов с комментариями, поэтому каналы
+    без публикаций дольше idle_timeout секунд и самые давние сверх
+    max_channels забываются. Номера сообщений общие на процесс: канал,
+    созданный заново, не начнёт их с единицы.
+    """
+
+    def __init__(self, history=HISTORY, idle_timeout=MESSAGE_TIMEOUT,
+                 max_channels=MAX_CHANNELS):
+        self.history = history
+        self.idle_timeout = idle_timeout
+        self.max_channels = max_channels
+        self.condition = threading.Condition()
+        self.sequence = 0
+        # channel -> (время публикации, последний номер, сообщения);
+        # порядок — от давно не обновлявшихся к свежим.
+        self.channels = OrderedDict()
+        self.waiters = set()
+
+    def evict(self, now):
+        while self.channels:
+            published, _, _ = next(iter(self.channels.values()))
+            if (len(self.channels) <= self.max_channels
+                    and now - published <= self.idle_timeout):
+                return
+            self.channels.popitem(last=False)
+
+    def publish(self, channel, message):
+        with self.condition:
+            self.sequence += 1
+            sequence = self.sequence
+            now = time.monotonic()
+            _, _, messages = self.channels.pop(
+                channel, (None, None, deque(maxlen=self.history)))
+            messages.append((sequence, message))
+            self.channels[channel] = (now, sequence, messages)
+            self.evict(now)
+            self.condition.notify_all()
+            # Читатели в цикле событий будятся из потока издателя.
+            for loop, waiter in self.waiters:
+                loop.call_soon_threadsafe(wake, waiter)
+        return sequence
+
+    def last_id(self, channel):
+        return self.channels.get(channel, (None, 0, None))[1]
+
+    def since(self, channel, after):
+        _, _, messages = self.channels.get(channel, (None, 0, ()))
+        return [
+            (sequence, message) for sequence, message in messages
+            if sequence > after
+        ]
+
+    def read(self, channel, after, timeout):
+        """Сообщения канала с номером больше after; ждёт до timeout."""
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.last_id(channel) > after, timeout)
+            return self.since(channel, after)
+
+    async def aread(self, channel, after, timeout):
+        """То же, что read, но ждёт в цикле событий, а не в потоке."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            with self.condition:
+                messages = self.since(channel, after)
+                remaining = deadline - loop.time()
+                if messages or remaining <= 0:
+                    return messages
+                waiter = (loop, loop.create_future())
+                self.waiters.add(waiter)
+            try:
+                await asyncio.wait_for(waiter[1], remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self.condition:
+                    self.waiters.discard(waiter)
+
+
+class CacheBackend:
+    """Каналы в общем кэше (memcached, redis): для нескольких узлов.
+
+    Номер последнего сообщения канала — счётчик в кэше, сами сообщения
+    лежат под своими номерами. Читатели опрашивают счётчик раз в
+    poll_interval секунд.
+    """
+
+    def __init__(self, alias='default', history=HISTORY, poll_interval=1.0):
+        self.cache = caches[alias]
+        self.history = history
+        self.poll_interval = poll_interval
+
+    def key(self, channel, suffix):
+        return f'{CACHE_PREFIX}:{channel}:{suffix}'
+
+    def publish(self, channel, message):
+        counter = self.key(channel, 'last')
+        self.cache.add(counter, 0, None)
+        sequence = self.cache.incr(counter)
+        self.cache.set(
+            self.key(channel, sequence), message, MESSAGE_TIMEOUT)
+        return sequence
+
+    def last_id(self, channel):
+        return self.cache.get(self.key(channel, 'last'), 0)
+
+    def poll(self, channel, after):
+        """Сообщения новее after и номер, с которого читать дальше."""
+        last = self.last_id(channel)
+        if last < after:
+            # Счётчик канала вытеснен из кэша и начался заново.
+            after = 0
+        if last <= after:
+            return [], after
+        first = max(after + 1, last - self.history + 1)
+        keys = {
+            self.key(channel, sequence): sequence
+            for sequence in range(first, last + 1)
+        }
+        found = self.cache.get_many(keys)
+        # Если сообщения успели истечь, ждём следующих.
+        return sorted(
+            (keys[key], message) for key, message in found.items()), last
+
+    def read(self, channel, after, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            messages, after = self.poll(channel, after)
+            remaining = deadline - time.monotonic()
+            if messages or remaining <= 0:
+                return messages
+            time.sleep(min(self.poll_interval, remaining))
+
+    async def aread(self, channel, after, timeout):
+        """Опрос из цикла событий; запросы к кэшу — в потоках по умолчанию."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            messages, after = await loop.run_in_executor(
+                None, self.poll, channel, after)
+            remaining = deadline - loop.time()
+            if messages or remaining <= 0:
+                return messages
+            await asyncio.sleep(min(self.poll_interval, remaining))
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    options = dict(settings.PUBSUB_BACKEND)
+    return import_string(options.pop('BACKEND'))(**options)
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    if setting == 'PUBSUB_BACKEND':
+        get_backend.cache_clear()
+
+
+def publish(channel, message):
+    """Опубликовать сообщение; при выключенных LIVE_UPDATES — ничего."""
+    if not settings.LIVE_UPDATES:
+        return None
+    return get_backend().publish(channel, message)
+
+
+def parse_event_id(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def format_event(sequence, event, message):
+    return (f'id: {sequence}\nevent: {event}\n'
+            f'data: {json.dumps(message, ensure_ascii=False)}\n\n')
+
+
+def event_stream(channel, after, event, accept=None):
+    """Генератор Server-Sent Events по каналу.
+
+    Соединение живёт не дольше SSE_MAX_DURATION: браузер переподключится
+    сам и передаст Last-Event-ID, пропущенное дочитается из истории.
+    Между сообщениями раз в SSE_KEEPALIVE секунд уходит комментарий,
+    чтобы прокси не закрыли соединение.
+
+    Под WSGI открытое соединение всё время занимает рабочий поток
+    сервера, поэтому LIVE_UPDATES включают только вместе с core.asgi:
+    там поток отдаёт aevent_stream.
+    """
+    backend = get_backend()
+    deadline = time.monotonic() + settings.SSE_MAX_DURATION
+    yield f'retry: {settings.SSE_RETRY_MS}\n\n'
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        messages = backend.read(
+            channel, after, min(settings.SSE_KEEPALIVE, remaining))
+        if not messages:
+            yield ': keepalive\n\n'
+            continue
+        for sequence, message in messages:
+            after = sequence
+            if accept is None or accept(message):
+                yield format_event(sequence, event, message)
+
+
+async def aevent_stream(channel, after, event, accept=None):
+    """Асинхронный вариант event_stream: ожидание не занимает потоков."""
+    backend = get_backend()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.SSE_MAX_DURATION
+    yield f'retry: {settings.SSE_RETRY_MS}\n\n'
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return
+        messages = await backend.aread(
+            channel, after, min(settings.SSE_KEEPALIVE, remaining))
+        if not messages:
+            yield ': keepalive\n\n'
+            continue
+        for sequence, message in messages:
+            after = sequence
+            if accept is None or accept(message):
+                yield format_event(sequence, event, message)
+
+
+class EventStreamResponse(StreamingHttpResponse):
+    """Поток SSE: под WSGI — генератор, под core.asgi — цикл событий."""
+
+    def __init__(self, channel, after, event, accept=None):
+        super().__init__(
+            event_stream(channel, after, event, accept),
+            content_type='text/event-stream',
+        )
+        self.stream_args = (channel, after, event, accept)
+        self['Cache-Control'] = 'no-cache'
+        # nginx не должен копить поток в буфере.
+        self['X-Accel-Buffering'] = 'no'
+
+    async def async_chunks(self):
+        async for chunk in aevent_stream(*self.stream_args):
+            yield self.make_bytes(chunk)
+
+
+def event_stream_response(request, channel, event, accept=None):
+    """Ответ text/event-stream; без Last-Event-ID — только новые события.
+
+    accept вызывается в цикле событий ASGI и не должен ходить в БД.
+    """
+    if not settings.LIVE_UPDATES:
+        raise Http404('Живые обновления выключены')
+    after = parse_event_id(request.META.get('HTTP_LAST_EVENT_ID'))
+    last = get_backend().last_id(channel)
+    # Номер больше последнего остался от прежнего процесса или вытесненного
+    # канала: с ним новые сообщения не дошли бы до клиента.
+    if after is None or after > last:
+        after = last
+    return EventStreamResponse(channel, after, event, accept)
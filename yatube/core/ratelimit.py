@@ -0,0 +1,152 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """'10/m' -> (10 запросов, 60 секунд)."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+class LocalStorage:
+    """Хранилище корзин в памяти процесса."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, period, now):
+        with self.lock:
+            bucket = self.buckets.get(key)
+            wait, self.buckets[key] = refill_and_take(
+                bucket, capacity, period, now)
+            return wait
+
+
+class CacheStorage:
+    """Хранилище корзин в общем кэше.
+
+    Корзину меняют под блокировкой на cache.add, иначе параллельные
+    запросы одного клиента читают одно состояние и все проходят.
+    """
+
+    lock_attempts = 20
+    lock_delay = 0.005
+    lock_timeout = 1
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, capacity, period, now):
+        lock = f'{key}:lock'
+        for _ in range(self.lock_attempts):
+            if self.cache.add(lock, 1, self.lock_timeout):
+                break
+            time.sleep(self.lock_delay)
+        else:
+            # Корзину держат чужие запросы того же клиента: он явно
+            # частит, отказываем, как при пустой корзине.
+            return period / capacity
+        try:
+            wait, bucket = refill_and_take(
+                self.cache.get(key), capacity, period, now)
+            self.cache.set(key, bucket, period)
+        finally:
+            self.cache.delete(lock)
+        return wait
+
+
+def refill_and_take(bucket, capacity, period, now):
+    """Пополнить корзину и взять жетон.
+
+    Возвращает (секунд до следующего жетона или 0, новое состояние).
+    """
+    tokens, updated = bucket or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * capacity / period)
+    if tokens >= 1:
+        return 0, (tokens - 1, now)
+    return (1 - tokens) * period / capacity, (tokens, now)
+
+
+def get_storage():
+    alias = getattr(settings, 'RATELIMIT_CACHE_ALIAS', 'default')
+    if alias:
+        try:
+            return CacheStorage(alias)
+        except InvalidCacheBackendError:
+            pass
+    return LocalStorage()
+
+
+def client_ip(request):
+    """IP клиента.
+
+    За обратным прокси REMOTE_ADDR — адрес прокси, поэтому IP берётся
+    из заголовка RATELIMIT_IP_HEADER. Каждый из RATELIMIT_TRUSTED_PROXIES
+    прокси дописывает в конец адрес, с которого к нему пришли; всё левее
+    прислал клиент и может быть подделано.
+    """
+    header = getattr(settings, 'RATELIMIT_IP_HEADER', None)
+    proxies = getattr(settings, 'RATELIMIT_TRUSTED_PROXIES', 1)
+    if header and proxies:
+        chain = [
+            ip.strip() for ip in request.META.get(header, '').split(',')
+            if ip.strip()
+        ]
+        if len(chain) >= proxies:
+            return chain[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def client_key(request):
+    """Пользователь, если вошёл, иначе IP-адрес."""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'ip:{client_ip(request)}'
+
+
+class RateLimitMiddleware:
+    """Ограничение частоты запросов к представлениям из settings.RATELIMITS.
+
+    Срабатывает в process_view, до вызова представления, и отвечает 429
+    с Retry-After.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.storage = get_storage()
+        self.limits = {
+            view_name: (parse_rate(limit['rate']), limit.get('methods'))
+            for view_name, limit in getattr(
+                settings, 'RATELIMITS', {}).items()
+        }
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_name = request.resolver_match.view_name
+        if view_name not in self.limits:
+            return None
+        (capacity, period), methods = self.limits[view_name]
+        if methods and request.method not in methods:
+            return None
+        wait = self.storage.take(
+            f'ratelimit:{view_name}:{client_key(request)}',
+            capacity,
+            period,
+            time.time(),
+        )
+        if not wait:
+            return None
+        response = HttpResponse(
+            'Слишком много запросов, попробуйте позже.', status=429)
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
@@ -0,0 +1,107 @@
+import mimetypes
+import os
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date
+
+from .compression import choose_encoding
+from .media import file_etag, not_modified
+
+# Хешированное имя меняется вместе с содержимым, кэшировать можно навсегда.
+IMMUTABLE_MAX_AGE: int = 365 * 24 * 60 * 60
+DEFAULT_MAX_AGE: int = 60
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StaticFile:
+    """Файл из STATIC_ROOT и его заранее сжатые варианты."""
+
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        self.path = path
+        self.size = stat.st_size
+        self.last_modified = int(stat.st_mtime)
+        self.etag = file_etag(stat)
+        self.content_type = (
+            mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        self.max_age = IMMUTABLE_MAX_AGE if immutable else DEFAULT_MAX_AGE
+        # У каждого варианта свои байты, а значит и свой ETag.
+        self.variants = {
+            encoding: (path + suffix, file_etag(os.stat(path + suffix)))
+            for encoding, suffix in ENCODINGS
+            if os.path.exists(path + suffix)
+        }
+
+    def choose(self, accept_encoding):
+        """(кодировка или None, путь, ETag) варианта для Accept-Encoding."""
+        encoding = choose_encoding(accept_encoding, tuple(self.variants))
+        if encoding is None:
+            return None, self.path, self.etag
+        return (encoding, *self.variants[encoding])
+
+
+def is_hashed(name):
+    """style.3b2f5c8e1a4d.css — имя с хешем ManifestStaticFilesStorage."""
+    parts = os.path.basename(name).split('.')
+    return len(parts) >= 3 and len(parts[-2]) == 12 and all(
+        char in '0123456789abcdef' for char in parts[-2])
+
+
+def scan(root):
+    """Индекс файлов строится один раз при старте, без stat на запрос."""
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(('.gz', '.br')):
+                continue
+            path = os.path.join(directory, name)
+            url_name = os.path.relpath(path, root).replace(os.sep, '/')
+            files[url_name] = StaticFile(path, is_hashed(url_name))
+    return files
+
+
+class StaticFilesMiddleware:
+    """Раздача STATIC_ROOT из процесса, когда перед ним нет прокси.
+
+    Отдаёт заранее сжатый вариант по Accept-Encoding, ставит долгий
+    Cache-Control для хешированных имён и отвечает через FileResponse,
+    который WSGI-сервер передаёт в wsgi.file_wrapper (sendfile).
+    Включается настройкой SERVE_STATIC.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVE_STATIC', False) or not (
+                settings.STATIC_ROOT and os.path.isdir(settings.STATIC_ROOT)):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.files = scan(settings.STATIC_ROOT)
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path.startswith(
+                self.prefix):
+            static_file = self.files.get(request.path[len(self.prefix):])
+            if static_file is not None:
+                return self.serve(request, static_file)
+        return self.get_response(request)
+
+    def serve(self, request, static_file):
+        encoding, path, etag = static_file.choose(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if not_modified(request, etag, static_file.last_modified):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(
+                open(path, 'rb'), content_type=static_file.content_type)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(static_file.last_modified)
+        response['Cache-Control'] = f'public, max-age={static_file.max_age}'
+        if static_file.max_age == IMMUTABLE_MAX_AGE:
+            response['Cache-Control'] += ', immutable'
+        if static_file.variants:
+            response['Vary'] = 'Accept-Encoding'
+        return response
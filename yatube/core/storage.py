@@ -0,0 +1,93 @@
+import gzip
+import hashlib
+import os
+import posixpath
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.dispatch import Signal
+from django.utils.deconstruct import deconstructible
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.svg', '.ico', '.txt', '.html', '.json', '.xml', '.map',
+)
+# Сжимать совсем маленькие файлы нет смысла: заголовки съедят выигрыш.
+MIN_COMPRESS_SIZE: int = 256
+
+
+def precompress(path):
+    """Записать рядом с файлом .gz и (если есть brotli) .br варианты."""
+    with open(path, 'rb') as source:
+        content = source.read()
+    if len(content) < MIN_COMPRESS_SIZE:
+        return
+    variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(content)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(content):
+            with open(path + suffix, 'wb') as target:
+                target.write(compressed)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хешированные имена файлов плюс заранее сжатые gzip/brotli копии."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            if (not dry_run and hashed_name
+                    and not isinstance(processed, Exception)
+                    and hashed_name.endswith(COMPRESSIBLE_EXTENSIONS)):
+                precompress(self.path(hashed_name))
+                if os.path.exists(self.path(name)):
+                    precompress(self.path(name))
+            yield name, hashed_name, processed
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Отправляется до проверки, есть ли уже файл с этим содержимым.
+# Получатель берёт ссылку на name: иначе последний владелец может удалить
+# файл между проверкой и сохранением нового поста.
+content_claimed = Signal()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файлы хранятся под sha256 содержимого: posts/ab/abcd….jpg.
+
+    Одинаковые загрузки получают одно имя и пишутся на диск один раз,
+    а sorl строит для них общие миниатюры. Учёт ссылок — posts.blobs.
+    """
+
+    def content_name(self, name, content):
+        digest = content_hash(content)
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name), digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        content_claimed.send(sender=self.__class__, name=name)
+        if not self.exists(name):
+            # Пишем во временный файл и атомарно переименовываем: две
+            # одновременные загрузки одного файла не увидят половину.
+            temporary = super().save(name + '.part', content)
+            os.replace(self.path(temporary), self.path(name))
+        return name
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.mail import get_connection
+
+from taskqueue.registry import task
+
+from .mail import deserialize_message
+
+# Соединение живёт в процессе воркера и переиспользуется между задачами.
+_connection = None
+
+
+def delivery_connection():
+    global _connection
+    if _connection is None:
+        _connection = get_connection(settings.QUEUED_EMAIL_BACKEND)
+        _connection.open()
+    return _connection
+
+
+def reset_connection():
+    global _connection
+    if _connection is not None:
+        _connection.close()
+        _connection = None
+
+
+@task(max_retries=5, retry_delay=30)
+def deliver_emails(messages):
+    """Отправить пачку писем одним соединением."""
+    try:
+        delivery_connection().send_messages(
+            [deserialize_message(message) for message in messages])
+    except Exception:
+        reset_connection()
+        raise
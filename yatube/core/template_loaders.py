@@ -0,0 +1,49 @@
+import re
+
+from django.template.loaders import app_directories, filesystem
+
+# Содержимое этих блоков выводится как есть: переносы и отступы значимы.
+PROTECTED_RE = re.compile(
+    r'(<(pre|textarea|script|style)\b.*?</\2\s*>'
+    r'|{%\s*verbatim\s*%}.*?{%\s*endverbatim\s*%})',
+    re.DOTALL | re.IGNORECASE,
+)
+TEMPLATE_COMMENT_RE = re.compile(
+    r'{%\s*comment\b[^%]*%}.*?{%\s*endcomment\s*%}', re.DOTALL)
+# Условные комментарии IE — разметка, а не комментарий.
+HTML_COMMENT_RE = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+# Пробелы в пределах строки не трогаем: они бывают значимы в атрибутах
+# и строках шаблонных тегов. Схлопываем только отступы и пустые строки.
+NEWLINE_RUN_RE = re.compile(r'[ \t]*\n\s*')
+# Письма в виде текста: там переносы и отступы — часть содержимого.
+SKIP_SUFFIXES = ('.txt', '_email.html')
+
+
+def minify(source):
+    """Убрать из исходника шаблона отступы, пустые строки и комментарии."""
+    source = TEMPLATE_COMMENT_RE.sub('', source)
+    parts = PROTECTED_RE.split(source)
+    # split с группами: текст, защищённый блок, имя тега, текст, ...
+    for index in range(0, len(parts), 3):
+        text = HTML_COMMENT_RE.sub('', parts[index])
+        parts[index] = NEWLINE_RUN_RE.sub('\n', text)
+    del parts[2::3]
+    return ''.join(parts).strip() + '\n'
+
+
+class MinifyingMixin:
+    """Минификация один раз при чтении шаблона, а не на каждый ответ."""
+
+    def get_contents(self, origin):
+        contents = super().get_contents(origin)
+        if origin.name.endswith(SKIP_SUFFIXES):
+            return contents
+        return minify(contents)
+
+
+class FilesystemLoader(MinifyingMixin, filesystem.Loader):
+    pass
+
+
+class AppDirectoriesLoader(MinifyingMixin, app_directories.Loader):
+    pass
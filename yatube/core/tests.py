@@ -1,4 +1,50 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from email.mime.base import MIMEBase
+from email.mime.text import MIMEText
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+from taskqueue.models import Task
+from taskqueue.worker import Worker
+
+from . import compression
+from .asgi import ASGIHandler, build_environ
+from .compression import CompressionMiddleware, accepted_encodings
+from .mail import deserialize_message, serialize_message
+from .pubsub import (
+    CacheBackend, LocalBackend, event_stream, event_stream_response,
+    get_backend, publish,
+)
+from .ratelimit import CacheStorage, LocalStorage, client_ip
+from .template_loaders import minify
+from .static import StaticFilesMiddleware
+from .tasks import reset_connection
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +52,733 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+    QUEUED_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class QueuedEmailTests(TestCase):
+    def tearDown(self):
+        reset_connection()
+
+    def run_worker(self):
+        with ThreadPoolExecutor(1) as pool:
+            Worker(processes=1).run_batch(pool)
+
+    def test_mail_is_sent_by_worker(self):
+        message = EmailMultiAlternatives(
+            'Тема', 'Текст', 'from@yatube.ru', ['to@yatube.ru'])
+        message.attach_alternative('<p>Текст</p>', 'text/html')
+        message.send()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Task.objects.count(), 1)
+        self.run_worker()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Тема')
+        self.assertEqual(mail.outbox[0].alternatives, [
+            ('<p>Текст</p>', 'text/html')])
+
+    def test_mime_attachments_survive_the_queue(self):
+        message = EmailMessage(
+            'Тема', 'Текст', 'from@yatube.ru', ['to@yatube.ru'])
+        message.attach('notes.txt', 'заметки', 'text/plain')
+        calendar = MIMEText('BEGIN:VCALENDAR', 'calendar')
+        calendar.add_header(
+            'Content-Disposition', 'attachment', filename='invite.ics')
+        message.attach(calendar)
+        restored = deserialize_message(
+            json.loads(json.dumps(serialize_message(message))))
+        self.assertEqual(
+            restored.attachments[0], ('notes.txt', 'заметки', 'text/plain'))
+        part = restored.attachments[1]
+        self.assertIsInstance(part, MIMEBase)
+        self.assertEqual(part.get_content_type(), 'text/calendar')
+        self.assertEqual(part.get_filename(), 'invite.ics')
+        self.assertIn(b'BEGIN:VCALENDAR', restored.message().as_bytes())
+
+    def test_password_reset_does_not_send_in_request(self):
+        User.objects.create_user(
+            username='user', email='user@yatube.ru', password='pass-word1')
+        self.client.post(
+            reverse('password_reset'), {'email': 'user@yatube.ru'})
+        self.assertEqual(len(mail.outbox), 0)
+        self.run_worker()
+        self.assertEqual(mail.outbox[0].to, ['user@yatube.ru'])
+
+
+class SessionTests(TestCase):
+    def test_logout_invalidates_cached_session(self):
+        """После выхода старая кука сессии не авторизует."""
+        User.objects.create_user(username='user', password='pass-word1')
+        self.client.login(username='user', password='pass-word1')
+        session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.assertEqual(
+            self.client.get(reverse('posts:follow_index')).status_code, 200)
+        self.client.get(reverse('users:logout'))
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_authenticated_request_skips_session_query(self):
+        User.objects.create_user(username='user', password='pass-word1')
+        self.client.login(username='user', password='pass-word1')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('about:author'))
+        self.assertFalse(any(
+            'django_session' in query['sql']
+            for query in queries.captured_queries))
+
+
+class RateLimitTests(TestCase):
+    @override_settings(RATELIMITS={
+        'posts:add_comment': {'rate': '2/m', 'methods': ('POST',)},
+    })
+    def test_write_endpoint_is_throttled(self):
+        user = User.objects.create_user(username='user')
+        post = Post.objects.create(author=user, text='Пост')
+        self.client.force_login(user)
+        url = reverse('posts:add_comment', args=(post.pk,))
+        statuses = [
+            self.client.post(url, {'text': 'Комментарий'}).status_code
+            for _ in range(3)
+        ]
+        self.assertEqual(statuses, [302, 302, 429])
+        self.assertEqual(post.comments.count(), 2)
+        response = self.client.post(url, {'text': 'Комментарий'})
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_token_bucket_refills(self):
+        storage = LocalStorage()
+        self.assertEqual(storage.take('key', 1, 60, now=0), 0)
+        self.assertEqual(storage.take('key', 1, 60, now=30), 30)
+        self.assertEqual(storage.take('key', 1, 60, now=60), 0)
+
+    def test_cache_bucket_is_not_overdrawn_by_parallel_requests(self):
+        storage = CacheStorage('default')
+        storage.lock_delay = 0.001
+        storage.lock_attempts = 1000
+        cache.delete('ratelimit:parallel')
+        with ThreadPoolExecutor(8) as pool:
+            waits = list(pool.map(
+                lambda _: storage.take('ratelimit:parallel', 5, 60, 0),
+                range(20)))
+        self.assertEqual(waits.count(0), 5)
+
+    @override_settings(
+        RATELIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR',
+        RATELIMIT_TRUSTED_PROXIES=1,
+    )
+    def test_client_ip_comes_from_trusted_proxy_header(self):
+        factory = RequestFactory()
+        request = factory.get(
+            '/', HTTP_X_FORWARDED_FOR='6.6.6.6, 203.0.113.7',
+            REMOTE_ADDR='10.0.0.1')
+        # Левый адрес прислал клиент, верим только дописанному прокси.
+        self.assertEqual(client_ip(request), '203.0.113.7')
+        self.assertEqual(
+            client_ip(factory.get('/', REMOTE_ADDR='10.0.0.1')), '10.0.0.1')
+
+
+class StaticPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.source = tempfile.mkdtemp()
+        cls.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(cls.source, 'css'))
+        with open(os.path.join(cls.source, 'css', 'site.css'), 'w') as css:
+            css.write('body { color: #333; }\n' * 100)
+        with open(os.path.join(cls.source, 'favicon.png'), 'wb') as png:
+            png.write(b'\x89PNG' + b'\x00' * 300)
+        cls.settings = override_settings(
+            STATICFILES_DIRS=[cls.source],
+            STATIC_ROOT=cls.root,
+            STATICFILES_STORAGE=(
+                'core.storage.CompressedManifestStaticFilesStorage'),
+            SERVE_STATIC=True,
+        )
+        cls.settings.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        shutil.rmtree(cls.source, ignore_errors=True)
+        shutil.rmtree(cls.root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = StaticFilesMiddleware(
+            lambda request: None)
+        self.hashed = next(
+            name for name in self.middleware.files
+            if name.startswith('css/site.') and name != 'css/site.css')
+
+    def get(self, path, **headers):
+        return self.middleware(self.factory.get(path, **headers))
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        path = os.path.join(self.root, self.hashed)
+        with open(path, 'rb') as original, open(path + '.gz', 'rb') as gz:
+            self.assertEqual(gzip.decompress(gz.read()), original.read())
+        # Бинарные форматы уже сжаты, для них копий не делаем.
+        self.assertFalse(any(
+            name.endswith('.png.gz') for name in os.listdir(self.root)))
+
+    def test_hashed_file_is_immutable_and_gzipped(self):
+        response = self.get(
+            '/static/' + self.hashed, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        body = b''.join(response.streaming_content)
+        self.assertIn(b'color: #333', gzip.decompress(body))
+
+    def test_plain_name_without_encoding(self):
+        response = self.get('/static/css/site.css')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'text/css')
+        response.close()
+
+    def test_etag_not_modified(self):
+        response = self.get('/static/' + self.hashed)
+        response.close()
+        response = self.get(
+            '/static/' + self.hashed, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_each_encoding_has_its_own_etag(self):
+        url = '/static/' + self.hashed
+        plain = self.get(url)
+        gzipped = self.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        refused = self.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        for response in (plain, gzipped, refused):
+            response.close()
+        self.assertNotEqual(plain['ETag'], gzipped['ETag'])
+        self.assertFalse(refused.has_header('Content-Encoding'))
+        tags = f'"other", W/{gzipped["ETag"]}'
+        self.assertEqual(self.get(
+            url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=tags,
+        ).status_code, 304)
+        # Сжатый ETag не подходит к несжатому варианту.
+        response = self.get(url, HTTP_IF_NONE_MATCH=tags)
+        response.close()
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_path_passes_through(self):
+        self.assertIsNone(self.get('/static/missing.css'))
+        self.assertIsNone(self.get('/'))
+
+
+class MediaServingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(cls.root, 'posts'))
+        cls.content = bytes(range(256)) * 40
+        with open(os.path.join(cls.root, 'posts', 'pic.gif'), 'wb') as file:
+            file.write(cls.content)
+        with open(os.path.join(cls.root, 'secret.txt'), 'w') as file:
+            file.write('secret')
+        cls.settings = override_settings(MEDIA_ROOT=cls.root)
+        cls.settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        shutil.rmtree(cls.root, ignore_errors=True)
+        super().tearDownClass()
+
+    url = '/media/posts/pic.gif'
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.body(response), self.content)
+
+    def test_ranges(self):
+        size = len(self.content)
+        cases = (
+            ('bytes=0-99', 0, 99),
+            ('bytes=10000-', 10000, size - 1),
+            ('bytes=-24', size - 24, size - 1),
+            ('bytes=100-999999', 100, size - 1),
+        )
+        for header, start, end in cases:
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(
+                    response['Content-Range'], f'bytes {start}-{end}/{size}')
+                self.assertEqual(
+                    int(response['Content-Length']), end - start + 1)
+                self.assertEqual(
+                    self.body(response), self.content[start:end + 1])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=999999-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(
+            response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_if_none_match_and_if_range(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Устаревший If-Range: диапазон игнорируется, отдаётся весь файл.
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    def test_only_allowed_directories(self):
+        for url in ('/media/secret.txt', '/media/posts/../secret.txt',
+                    '/media/posts/missing.gif', '/media/posts/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+    def test_sendfile_handoff(self):
+        with self.settings_for('X-Accel-Redirect'):
+            response = self.client.get(self.url)
+            self.assertEqual(
+                response['X-Accel-Redirect'], '/protected-media/posts/pic.gif')
+            self.assertEqual(response.content, b'')
+        with self.settings_for('X-Sendfile'):
+            response = self.client.get(self.url)
+            self.assertEqual(
+                response['X-Sendfile'],
+                os.path.join(self.root, 'posts', 'pic.gif'))
+
+    def settings_for(self, header):
+        return override_settings(MEDIA_SENDFILE=header)
+
+
+class CompressionTests(TestCase):
+    page = '<p>пост</p>' * 200
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def run_middleware(self, response, accept='gzip, deflate'):
+        middleware = CompressionMiddleware(lambda request: response)
+        return middleware(self.factory.get('/', HTTP_ACCEPT_ENCODING=accept))
+
+    def test_accept_encoding_parsing(self):
+        self.assertEqual(
+            accepted_encodings('gzip;q=1.0, br;q=0, identity'),
+            {'gzip', 'identity'})
+        self.assertEqual(
+            accepted_encodings('gzip;Q=0, br ; q = 0.0, deflate;q=x'),
+            {'deflate'})
+
+    def test_malformed_quality_is_not_an_error(self):
+        response = self.run_middleware(
+            HttpResponse(self.page), accept='gzip;q=x')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_html_is_gzipped(self):
+        response = self.run_middleware(HttpResponse(self.page))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(
+            gzip.decompress(response.content).decode(), self.page)
+        self.assertEqual(
+            int(response['Content-Length']), len(response.content))
+
+    def test_skipped_responses(self):
+        cases = (
+            ('короткий ответ', HttpResponse('ok'), 'gzip'),
+            ('картинка', HttpResponse(
+                b'x' * 1000, content_type='image/jpeg'), 'gzip'),
+            ('без Accept-Encoding', HttpResponse(self.page), ''),
+            ('gzip запрещён', HttpResponse(self.page), 'gzip;q=0'),
+        )
+        for label, response, accept in cases:
+            with self.subTest(label):
+                response = self.run_middleware(response, accept)
+                self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_response(self):
+        chunks = [f'<li>{number}</li>'.encode() for number in range(300)]
+        response = self.run_middleware(StreamingHttpResponse(iter(chunks)))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        decompressor = zlib.decompressobj(31)
+        # Каждый кусок декодируется сразу, не дожидаясь конца потока.
+        first = next(iter(response.streaming_content))
+        self.assertEqual(decompressor.decompress(first), b'<li>0</li>')
+
+    def test_cacheable_pages_are_compressed_once(self):
+        def cached_response():
+            response = HttpResponse(self.page)
+            response['Cache-Control'] = 'max-age=20'
+            response['ETag'] = '"abc"'
+            return response
+
+        with mock.patch.object(
+                compression, 'compress', wraps=compression.compress) as spy:
+            first = self.run_middleware(cached_response())
+            second = self.run_middleware(cached_response())
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second['ETag'], 'W/"abc"')
+
+    def test_index_page_is_compressed(self):
+        Post.objects.create(
+            text='Текст ' * 100,
+            author=User.objects.create_user(username='author'))
+        response = self.client.get(
+            reverse('posts:index'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(
+            'Текст'.encode(), gzip.decompress(response.content))
+
+
+class MinifyTemplateTests(TestCase):
+    def test_indentation_and_comments_are_removed(self):
+        source = (
+            '<ul>\n'
+            '    <!-- меню -->\n'
+            '    {% comment %}\n      старый код\n    {% endcomment %}\n'
+            '    <li title="a  b">{{ x|default:"c   d" }}</li>\n'
+            '\n\n'
+            '    <!--[if IE]>ie<![endif]-->\n'
+            '</ul>\n'
+        )
+        self.assertEqual(minify(source), (
+            '<ul>\n'
+            '<li title="a  b">{{ x|default:"c   d" }}</li>\n'
+            '<!--[if IE]>ie<![endif]-->\n'
+            '</ul>\n'
+        ))
+
+    def test_preformatted_blocks_are_kept(self):
+        blocks = (
+            '<pre>\n  код\n\n    отступ\n</pre>',
+            '<TEXTAREA name="t">\n  текст\n</TEXTAREA>',
+            '<script>\n  var a = 1\n  // <!-- не комментарий -->\n</script>',
+            '{% verbatim %}\n  {{ raw }}\n{% endverbatim %}',
+        )
+        for block in blocks:
+            with self.subTest(block=block):
+                self.assertIn(block, minify(f'<div>\n  {block}\n</div>'))
+
+    def test_pages_render_without_indentation(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        # Скрипты защищены от минификации, их содержимое не проверяем.
+        html = re.sub(
+            r'<script>.*?</script>', '', response.content.decode(),
+            flags=re.DOTALL)
+        self.assertNotIn('\n  ', html)
+
+
+class ASGIHandlerTests(SimpleTestCase):
+    def call(self, path, headers=(), query_string=b'', method='GET',
+             body=(b'',)):
+        scope = {
+            'type': 'http',
+            'method': method,
+            'path': path,
+            'query_string': query_string,
+            'headers': [(b'host', b'testserver'), *headers],
+        }
+        messages = []
+        requests = [
+            {'type': 'http.request', 'body': chunk, 'more_body': True}
+            for chunk in body
+        ]
+        requests[-1]['more_body'] = False
+
+        async def receive():
+            if requests:
+                return requests.pop(0)
+            # Клиент на связи, пока ответ не отправлен.
+            await asyncio.Event().wait()
+
+        async def send(message):
+            messages.append(message)
+
+        handler = ASGIHandler()
+        asyncio.run(handler(scope, receive, send))
+        handler.pool.shutdown()
+        start, *body = messages
+        return (
+            start['status'],
+            dict(start['headers']),
+            b''.join(message.get('body', b'') for message in body),
+        )
+
+    def test_environ_from_scope(self):
+        environ = build_environ({
+            'method': 'POST',
+            'path': '/группа/',
+            'query_string': b'page=2',
+            'headers': [
+                (b'content-type', b'text/plain'),
+                (b'x-forwarded-for', b'1.1.1.1'),
+                (b'x-forwarded-for', b'2.2.2.2'),
+            ],
+        }, None)
+        self.assertEqual(environ['PATH_INFO'].encode('latin-1').decode(),
+                         '/группа/')
+        self.assertEqual(environ['QUERY_STRING'], 'page=2')
+        self.assertEqual(environ['CONTENT_TYPE'], 'text/plain')
+        self.assertEqual(environ['HTTP_X_FORWARDED_FOR'], '1.1.1.1,2.2.2.2')
+
+    def test_page_through_asgi(self):
+        status, headers, body = self.call(
+            reverse('about:author'), [(b'accept-encoding', b'gzip')])
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'content-encoding'], b'gzip')
+        self.assertIn(b'</html>', gzip.decompress(body))
+
+    @override_settings(ASGI_MAX_BODY_SIZE=10)
+    def test_body_over_limit_is_rejected(self):
+        status, _, _ = self.call(
+            '/', [(b'content-length', b'11')], method='POST',
+            body=[b'x' * 11])
+        self.assertEqual(status, 413)
+        # Без Content-Length — по тому, сколько уже пришло.
+        status, _, _ = self.call(
+            '/', method='POST', body=[b'x' * 6, b'x' * 6, b'x' * 6])
+        self.assertEqual(status, 413)
+
+    def test_streaming_response_through_asgi(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        os.makedirs(os.path.join(root, 'posts'))
+        content = os.urandom(200 * 1024)
+        with open(os.path.join(root, 'posts', 'big.jpg'), 'wb') as file:
+            file.write(content)
+        with override_settings(MEDIA_ROOT=root):
+            status, headers, body = self.call('/media/posts/big.jpg')
+        self.assertEqual(status, 200)
+        self.assertEqual(body, content)
+
+    def test_stream_stops_on_disconnect(self):
+        """Отключение клиента закрывает генератор в том же потоке."""
+        threads = []
+        closed = []
+
+        def chunks():
+            try:
+                while True:
+                    threads.append(threading.get_ident())
+                    yield b'chunk'
+            finally:
+                closed.append(threading.get_ident())
+
+        response = StreamingHttpResponse(chunks())
+        sent = []
+
+        async def run():
+            disconnected = asyncio.get_running_loop().create_future()
+
+            async def send(message):
+                sent.append(message)
+                if len(sent) == 4:
+                    disconnected.set_result(None)
+
+            handler = ASGIHandler()
+            await handler.stream(
+                response, {'status': 200, 'headers': []}, send, disconnected)
+            handler.pool.shutdown()
+
+        asyncio.run(run())
+        self.assertLessEqual(len(sent), 5)
+        self.assertNotIn({'type': 'http.response.body'}, sent)
+        self.assertEqual(len(closed), 1)
+        self.assertEqual(set(threads), set(closed))
+
+    @override_settings(
+        ASGI_THREADS=1, LIVE_UPDATES=True, SSE_KEEPALIVE=5,
+        SSE_MAX_DURATION=5,
+        PUBSUB_BACKEND={'BACKEND': 'core.pubsub.LocalBackend'},
+    )
+    def test_event_streams_do_not_hold_threads(self):
+        """Открытые SSE-потоки не мешают обычным запросам."""
+        handler = ASGIHandler()
+
+        def scope(path):
+            return {
+                'type': 'http', 'method': 'GET', 'path': path,
+                'query_string': b'', 'headers': [(b'host', b'testserver')],
+            }
+
+        async def run():
+            gone = asyncio.Event()
+            sent = []
+
+            async def client(path, messages):
+                requests = [{'type': 'http.request', 'body': b''}]
+
+                async def receive():
+                    if requests:
+                        return requests.pop()
+                    await gone.wait()
+                    return {'type': 'http.disconnect'}
+
+                async def send(message):
+                    messages.append(message)
+
+                await handler(scope(path), receive, send)
+
+            streams = [
+                asyncio.ensure_future(
+                    client(reverse('posts:feed_events'), sent))
+                for _ in range(3)
+            ]
+            await asyncio.sleep(0.2)
+            # Ожидание событий идёт в цикле событий, а не в потоках ответа.
+            self.assertFalse([
+                thread for thread in threading.enumerate()
+                if thread.name.startswith('asgi-stream')
+            ])
+            page = []
+            await asyncio.wait_for(client(reverse('about:author'), page), 2)
+            publish('posts', {'id': 1})
+            await asyncio.sleep(0.1)
+            gone.set()
+            await asyncio.wait_for(asyncio.gather(*streams), 2)
+            return page, sent
+
+        page, sent = asyncio.run(run())
+        handler.pool.shutdown()
+        self.assertEqual(page[0]['status'], 200)
+        bodies = b''.join(message.get('body', b'') for message in sent)
+        self.assertEqual(bodies.count(b'event: post'), 3)
+
+    def test_not_found_through_asgi(self):
+        status, _, _ = self.call('/nonexist-page/')
+        self.assertEqual(status, 404)
+
+    def test_lifespan(self):
+        messages = iter(({'type': 'lifespan.startup'},
+                         {'type': 'lifespan.shutdown'}))
+        sent = []
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(ASGIHandler()({'type': 'lifespan'}, receive, send))
+        self.assertEqual(sent, ['lifespan.startup.complete',
+                                'lifespan.shutdown.complete'])
+
+
+class PubSubTests(SimpleTestCase):
+    def backends(self):
+        cache.clear()
+        return (LocalBackend(history=3), CacheBackend(
+            history=3, poll_interval=0.01))
+
+    def test_publish_and_read_history(self):
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                for number in range(5):
+                    backend.publish('feed', {'n': number})
+                self.assertEqual(backend.last_id('feed'), 5)
+                # Хранится только history последних сообщений.
+                self.assertEqual(
+                    [message['n'] for _, message in backend.read(
+                        'feed', 0, 0)], [2, 3, 4])
+                self.assertEqual(backend.read('feed', 5, 0.05), [])
+                self.assertEqual(backend.read('other', 0, 0), [])
+
+    def test_reader_wakes_up_on_publish(self):
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                timer = threading.Timer(
+                    0.05, backend.publish, ('feed', {'n': 1}))
+                started = time.monotonic()
+                timer.start()
+                messages = backend.read('feed', 0, 5)
+                timer.join()
+                self.assertEqual(messages, [(1, {'n': 1})])
+                self.assertLess(time.monotonic() - started, 1)
+
+    def test_async_reader_wakes_up_on_publish(self):
+        """aread ждёт в цикле событий и просыпается от publish из потока."""
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                timer = threading.Timer(
+                    0.05, backend.publish, ('feed', {'n': 1}))
+
+                async def read():
+                    timer.start()
+                    started = time.monotonic()
+                    messages = await backend.aread('feed', 0, 5)
+                    return messages, time.monotonic() - started
+
+                messages, elapsed = asyncio.run(read())
+                timer.join()
+                self.assertEqual(messages, [(1, {'n': 1})])
+                self.assertLess(elapsed, 1)
+                self.assertEqual(
+                    asyncio.run(backend.aread('feed', 1, 0.05)), [])
+
+    def test_idle_and_surplus_channels_are_evicted(self):
+        backend = LocalBackend(max_channels=2, idle_timeout=60)
+        with mock.patch('core.pubsub.time.monotonic', return_value=0):
+            for channel in ('a', 'b', 'c'):
+                backend.publish(channel, {})
+        self.assertEqual(backend.last_id('a'), 0)
+        self.assertEqual(backend.last_id('c'), 3)
+        with mock.patch('core.pubsub.time.monotonic', return_value=61):
+            backend.publish('d', {})
+        self.assertEqual(list(backend.channels), ['d'])
+        # Номера не начинаются заново и у вытесненного канала.
+        self.assertEqual(backend.publish('a', {}), 5)
+
+    @override_settings(
+        PUBSUB_BACKEND={'BACKEND': 'core.pubsub.LocalBackend'},
+        LIVE_UPDATES=False,
+    )
+    def test_publish_is_skipped_without_live_updates(self):
+        self.assertIsNone(publish('feed', {'id': 1}))
+        self.assertEqual(get_backend().last_id('feed'), 0)
+
+    @override_settings(
+        PUBSUB_BACKEND={'BACKEND': 'core.pubsub.LocalBackend'},
+        LIVE_UPDATES=True,
+    )
+    def test_event_id_from_previous_process_is_reset(self):
+        publish('feed', {'id': 1})
+        request = RequestFactory().get('/', HTTP_LAST_EVENT_ID='50')
+        response = event_stream_response(request, 'feed', 'post')
+        self.assertEqual(response.stream_args[1], 1)
+        # Счётчик в кэше начался заново — читаем его с начала.
+        backend = CacheBackend()
+        cache.clear()
+        backend.publish('feed', {'id': 1})
+        self.assertEqual(backend.poll('feed', 50), ([(1, {'id': 1})], 1))
+
+    @override_settings(
+        PUBSUB_BACKEND={'BACKEND': 'core.pubsub.LocalBackend'},
+        SSE_MAX_DURATION=0.2, SSE_KEEPALIVE=0.05, SSE_RETRY_MS=1000,
+        LIVE_UPDATES=True,
+    )
+    def test_event_stream_format(self):
+        publish('feed', {'id': 1})
+        publish('feed', {'id': 2})
+        events = list(event_stream(
+            'feed', 0, 'post', accept=lambda message: message['id'] == 2))
+        self.assertEqual(events[0], 'retry: 1000\n\n')
+        data = json.dumps({'id': 2})
+        self.assertEqual(events[1], f'id: 2\nevent: post\ndata: {data}\n\n')
+        self.assertIn(': keepalive\n\n', events[2:])
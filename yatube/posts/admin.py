@@ -1,6 +1,7 @@
 from django.contrib import admin
 from .models import Post
 from .models import Group
+from .models import GroupStats
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -17,5 +18,16 @@ class PostAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class GroupStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        'group',
+        'posts_count',
+        'last_post_at',
+        'top_authors',
+    )
+    readonly_fields = list_display
+
+
 admin.site.register(Post, PostAdmin,)
 admin.site.register(Group)
+admin.site.register(GroupStats, GroupStatsAdmin)
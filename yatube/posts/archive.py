@@ -0,0 +1,142 @@
+from datetime import date, datetime, time
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q
+from django.db.models.functions import Greatest, Least, TruncMonth
+from django.utils import timezone
+
+from .models import ArchiveMonth, Post
+
+SITE_SCOPE: str = 'site'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def post_scopes(author_id, group_id):
+    scopes = [SITE_SCOPE, author_scope(author_id)]
+    if group_id is not None:
+        scopes.append(group_scope(group_id))
+    return scopes
+
+
+def month_start(moment):
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def scope_posts(scope):
+    """Посты раздела архива."""
+    if scope == SITE_SCOPE:
+        return Post.objects.all()
+    kind, pk = scope.split(':')
+    return Post.objects.filter(**{f'{kind}_id': int(pk)})
+
+
+def month_posts(scope, archive_month):
+    """Посты месяца: выборка по диапазону первичного ключа.
+
+    id постов растут вместе с pub_date (auto_now_add), поэтому месяц —
+    непрерывный диапазон id.
+    """
+    return scope_posts(scope).filter(pk__range=(
+        archive_month.first_id, archive_month.last_id))
+
+
+@transaction.atomic
+def add_to_scopes(post, scopes):
+    month = month_start(post.pub_date)
+    for scope in scopes:
+        _, created = ArchiveMonth.objects.get_or_create(
+            scope=scope,
+            month=month,
+            defaults={
+                'posts_count': 1,
+                'first_id': post.pk,
+                'last_id': post.pk,
+            },
+        )
+        if not created:
+            ArchiveMonth.objects.filter(scope=scope, month=month).update(
+                posts_count=F('posts_count') + 1,
+                first_id=Least('first_id', post.pk),
+                last_id=Greatest('last_id', post.pk),
+            )
+
+
+@transaction.atomic
+def remove_from_scopes(post, scopes):
+    month = month_start(post.pub_date)
+    for scope in scopes:
+        months = ArchiveMonth.objects.filter(scope=scope, month=month)
+        months.filter(posts_count__lte=1).delete()
+        months.update(posts_count=F('posts_count') - 1)
+        if months.filter(Q(first_id=post.pk) | Q(last_id=post.pk)).exists():
+            bounds = scope_posts(scope).filter(
+                pub_date__gte=month_bound(month),
+                pub_date__lt=month_bound(next_month(month)),
+            ).aggregate(first=Min('pk'), last=Max('pk'))
+            months.update(first_id=bounds['first'], last_id=bounds['last'])
+
+
+def month_bound(month):
+    return timezone.make_aware(datetime.combine(month, time.min))
+
+
+def next_month(month):
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
+
+
+def post_added(post):
+    add_to_scopes(post, post_scopes(post.author_id, post.group_id))
+
+
+def post_removed(post):
+    remove_from_scopes(post, post_scopes(post.author_id, post.group_id))
+
+
+def group_changed(post, old_group_id):
+    if old_group_id is not None:
+        remove_from_scopes(post, [group_scope(old_group_id)])
+    if post.group_id is not None:
+        add_to_scopes(post, [group_scope(post.group_id)])
+
+
+def month_rows(posts, scope_field=None):
+    fields = ['month'] + ([scope_field] if scope_field else [])
+    return posts.order_by().annotate(
+        month=TruncMonth('pub_date'),
+    ).values(*fields).annotate(
+        count=Count('pk'), first=Min('pk'), last=Max('pk'))
+
+
+@transaction.atomic
+def rebuild_archive():
+    """Полный пересчёт индекса месяцев по таблице постов."""
+    ArchiveMonth.objects.all().delete()
+    rows = [(SITE_SCOPE, row) for row in month_rows(Post.objects.all())]
+    rows += [
+        (author_scope(row['author']), row)
+        for row in month_rows(Post.objects.all(), 'author')
+    ]
+    rows += [
+        (group_scope(row['group']), row)
+        for row in month_rows(Post.objects.filter(group__isnull=False),
+                              'group')
+    ]
+    ArchiveMonth.objects.bulk_create(
+        ArchiveMonth(
+            scope=scope,
+            month=month_start(row['month']),
+            posts_count=row['count'],
+            first_id=row['first'],
+            last_id=row['last'],
+        )
+        for scope, row in rows
+    )
@@ -0,0 +1,57 @@
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from .models import MediaBlob, Post
+
+logger = logging.getLogger(__name__)
+
+
+@transaction.atomic
+def acquire(name):
+    """Пост начал ссылаться на файл.
+
+    UPDATE ждёт, пока collect удаляет запись; если она удалена, создаём
+    новую, и хранилище заново запишет файл.
+    """
+    if not name:
+        return
+    while not MediaBlob.objects.filter(name=name).update(
+            refs=F('refs') + 1):
+        _, created = MediaBlob.objects.get_or_create(
+            name=name, defaults={'refs': 1})
+        if created:
+            return
+
+
+def release(name):
+    """Пост перестал ссылаться на файл; последний освобождает его."""
+    if not name:
+        return
+    MediaBlob.objects.filter(name=name, refs__gt=0).update(
+        refs=F('refs') - 1)
+    transaction.on_commit(lambda: collect(name))
+
+
+def collect(name):
+    """Удалить файл и его миниатюры, если на него больше никто не ссылается.
+
+    Запись удаляется условно по refs=0, поэтому параллельная загрузка того
+    же содержимого, успевшая сделать acquire, файл сохранит. Файл удаляется
+    до коммита: загрузка, пришедшая позже, ждёт в acquire и уже не найдёт
+    старый файл, а запишет его заново.
+    """
+    with transaction.atomic():
+        deleted, _ = MediaBlob.objects.filter(name=name, refs=0).delete()
+        if not deleted:
+            return
+        storage = Post._meta.get_field('image').storage
+        try:
+            delete_with_thumbnails(ImageFile(name, storage))
+        except Exception:
+            # Удаление поста уже закоммичено; осиротевший файл не повод
+            # для 500.
+            logger.exception('Failed to delete %s', name)
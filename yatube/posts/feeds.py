@@ -0,0 +1,114 @@
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .archive import scope_posts
+from .utils import EPOCH
+
+FEED_SIZE: int = 20
+FEED_CACHE_TIMEOUT: int = 60 * 60
+ATOM_CONTENT_TYPE: str = 'application/atom+xml; charset=utf-8'
+
+
+def feed_cache():
+    return caches[settings.FEED_CACHE_ALIAS]
+
+
+def feed_cache_key(scope, host):
+    return f'atom:{scope}:{host}'
+
+
+def feed_stamp_key(scope):
+    return f'atom-updated:{scope}'
+
+
+def feed_updated(scope):
+    """Время последнего изменения ленты раздела.
+
+    Отметка живёт не дольше тела ленты: если кэш не общий, процесс, не
+    видевший invalidate_feeds, отдаёт старую ленту не дольше
+    FEED_CACHE_TIMEOUT.
+    """
+    cache = feed_cache()
+    stamp = cache.get(feed_stamp_key(scope))
+    if stamp is None:
+        stamp = scope_posts(scope).aggregate(
+            last=Max('pub_date'))['last'] or EPOCH
+        cache.set(feed_stamp_key(scope), stamp, FEED_CACHE_TIMEOUT)
+    return stamp
+
+
+def invalidate_feeds(scopes):
+    """Новая отметка времени делает закэшированные ленты устаревшими."""
+    now = timezone.now()
+    feed_cache().set_many(
+        {feed_stamp_key(scope): now for scope in scopes}, FEED_CACHE_TIMEOUT)
+
+
+def atom_chunks(request, scope, title, link, updated):
+    """Atom-документ по частям; посты читаются через .iterator()."""
+    link = request.build_absolute_uri(link)
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="ru">'
+        f'<title>{escape(title)}</title>'
+        f'<link href={quoteattr(link)} rel="alternate"/>'
+        f'<link href={quoteattr(request.build_absolute_uri())} rel="self"/>'
+        f'<id>{escape(link)}</id>'
+        f'<updated>{updated.isoformat()}</updated>\n'
+    )
+    posts = scope_posts(scope).select_related('author')[:FEED_SIZE]
+    for post in posts.iterator():
+        url = request.build_absolute_uri(
+            reverse('posts:post_detail', args=(post.pk,)))
+        author = post.author.get_full_name() or post.author.username
+        yield (
+            '<entry>'
+            f'<title>{escape(post.text[:50])}</title>'
+            f'<link href={quoteattr(url)} rel="alternate"/>'
+            f'<id>{escape(url)}</id>'
+            f'<updated>{post.pub_date.isoformat()}</updated>'
+            f'<author><name>{escape(author)}</name></author>'
+            f'<content type="text">{escape(post.text)}</content>'
+            '</entry>\n'
+        )
+    yield '</feed>\n'
+
+
+def caching_stream(chunks, key, stamp):
+    """Отдаёт части ответа и кладёт тело в кэш, когда оно дописано."""
+    body = []
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    feed_cache().set(key, (stamp, ''.join(body)), FEED_CACHE_TIMEOUT)
+
+
+def atom_response(request, scope, title, link):
+    """Atom-лента раздела с поддержкой If-Modified-Since и кэшем."""
+    updated = feed_updated(scope)
+    last_modified = int(updated.timestamp())
+    response = get_conditional_response(request, last_modified=last_modified)
+    if response is None:
+        key = feed_cache_key(scope, request.get_host())
+        cached = feed_cache().get(key)
+        if cached is not None and cached[0] == updated:
+            response = HttpResponse(cached[1], content_type=ATOM_CONTENT_TYPE)
+        else:
+            response = StreamingHttpResponse(
+                caching_stream(
+                    atom_chunks(request, scope, title, link, updated),
+                    key,
+                    updated,
+                ),
+                content_type=ATOM_CONTENT_TYPE,
+            )
+    response['Last-Modified'] = http_date(last_modified)
+    return response
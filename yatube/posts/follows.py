@@ -0,0 +1,129 @@
+from functools import reduce
+from itertools import islice
+from operator import or_
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Follow, User
+
+FOLLOWING_CACHE_TIMEOUT: int = 60 * 60
+BULK_BATCH_SIZE: int = 500
+
+
+def following_cache_key(user_id):
+    return f'following:{user_id}'
+
+
+def following_ids(user):
+    """id авторов, на которых подписан пользователь (кэшируется)."""
+    if not user.is_authenticated:
+        return frozenset()
+    key = following_cache_key(user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(
+            Follow.objects.filter(user=user).values_list(
+                'author_id', flat=True)
+        )
+        cache.set(key, ids, FOLLOWING_CACHE_TIMEOUT)
+    return ids
+
+
+def is_following(user, author_ids):
+    """Словарь {id автора: подписан ли пользователь} для списка авторов."""
+    ids = following_ids(user)
+    return {author_id: author_id in ids for author_id in author_ids}
+
+
+def invalidate_following(user_id):
+    cache.delete(following_cache_key(user_id))
+
+
+def invalidate_following_many(user_ids):
+    cache.delete_many([following_cache_key(user_id) for user_id in user_ids])
+
+
+def follow(user, author):
+    """Идемпотентная подписка одним INSERT, дубли отсекает unique_follow."""
+    if user == author:
+        return
+    Follow.objects.bulk_create(
+        [Follow(user=user, author=author)], ignore_conflicts=True)
+    invalidate_following(user.pk)
+
+
+def unfollow(user, author):
+    """Отписка."""
+    Follow.objects.filter(user=user, author=author).delete()
+    invalidate_following(user.pk)
+
+
+def batched(iterable, size):
+    """Разбивает поток на списки не длиннее size."""
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def resolve_pairs(pairs):
+    """Пары (username, username) -> пары id; неизвестные и на себя выпадают."""
+    names = {name for pair in pairs for name in pair}
+    ids = dict(
+        User.objects.filter(username__in=names).values_list('username', 'pk'))
+    return [
+        (ids[user], ids[author]) for user, author in pairs
+        if user in ids and author in ids and user != author
+    ]
+
+
+def pairs_follows(resolved):
+    """Подписки, совпадающие с парами id (подписчик, автор)."""
+    return Follow.objects.filter(reduce(or_, (
+        Q(user_id=user, author_id=author) for user, author in resolved
+    )))
+
+
+def bulk_follow(pairs, batch_size=BULK_BATCH_SIZE):
+    """Подписки из потока пар (подписчик, автор) пачками.
+
+    Память не зависит от длины потока, повторы отсекает unique_follow.
+    Возвращает число действительно созданных подписок.
+    """
+    total = 0
+    for batch in batched(pairs, batch_size):
+        resolved = set(resolve_pairs(batch))
+        if not resolved:
+            continue
+        # Сколько пар уже есть — один COUNT; остальные bulk_create вставит.
+        total += len(resolved) - pairs_follows(resolved).count()
+        Follow.objects.bulk_create(
+            [Follow(user_id=user, author_id=author)
+             for user, author in resolved],
+            ignore_conflicts=True,
+        )
+        invalidate_following_many({user for user, _ in resolved})
+    return total
+
+
+def bulk_unfollow(pairs, batch_size=BULK_BATCH_SIZE):
+    """Отписки из потока пар (подписчик, автор) пачками."""
+    total = 0
+    for batch in batched(pairs, batch_size):
+        resolved = resolve_pairs(batch)
+        if not resolved:
+            continue
+        total += pairs_follows(resolved).delete()[0]
+        invalidate_following_many({user for user, _ in resolved})
+    return total
+
+
+def export_follows(user=None):
+    """Поток пар (подписчик, автор) без загрузки всех подписок в память."""
+    follows = Follow.objects.order_by('pk')
+    if user is not None:
+        follows = follows.filter(user=user)
+    return follows.values_list(
+        'user__username', 'author__username').iterator()
@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models import (
+    Case, Count, DateTimeField, F, Max, Value, When
+)
+
+from .models import GroupAuthorStats, GroupStats, Post
+
+TOP_AUTHORS: int = 3
+
+
+def refresh_top_authors(group_id):
+    names = GroupAuthorStats.objects.filter(
+        group_id=group_id, posts_count__gt=0,
+    ).order_by('-posts_count', 'author_id').values_list(
+        'author__username', flat=True)[:TOP_AUTHORS]
+    GroupStats.objects.filter(group_id=group_id).update(
+        top_authors=' '.join(names))
+
+
+@transaction.atomic
+def post_added(group_id, author_id, pub_date):
+    """Учесть новый пост группы без пересчёта по таблице Post."""
+    if group_id is None:
+        return
+    GroupStats.objects.get_or_create(group_id=group_id)
+    GroupStats.objects.filter(group_id=group_id).update(
+        posts_count=F('posts_count') + 1,
+        last_post_at=Case(
+            When(last_post_at__gte=pub_date, then=F('last_post_at')),
+            default=Value(pub_date, output_field=DateTimeField()),
+        ),
+    )
+    GroupAuthorStats.objects.get_or_create(
+        group_id=group_id, author_id=author_id)
+    GroupAuthorStats.objects.filter(
+        group_id=group_id, author_id=author_id,
+    ).update(posts_count=F('posts_count') + 1)
+    refresh_top_authors(group_id)
+
+
+@transaction.atomic
+def post_removed(group_id, author_id, pub_date):
+    """Учесть удаление поста из группы."""
+    if group_id is None:
+        return
+    GroupStats.objects.filter(group_id=group_id, posts_count__gt=0).update(
+        posts_count=F('posts_count') - 1)
+    GroupStats.objects.filter(
+        group_id=group_id, last_post_at__lte=pub_date,
+    ).update(last_post_at=Post.objects.filter(
+        group_id=group_id).aggregate(last=Max('pub_date'))['last'])
+    author_stats = GroupAuthorStats.objects.filter(
+        group_id=group_id, author_id=author_id)
+    author_stats.filter(posts_count__gt=0).update(
+        posts_count=F('posts_count') - 1)
+    author_stats.filter(posts_count=0).delete()
+    refresh_top_authors(group_id)
+
+
+@transaction.atomic
+def rebuild_group_stats():
+    """Полный пересчёт статистики, например после bulk_create."""
+    GroupAuthorStats.objects.all().delete()
+    GroupStats.objects.all().delete()
+    posts = Post.objects.filter(group__isnull=False).order_by()
+    GroupStats.objects.bulk_create(
+        GroupStats(
+            group_id=row['group'],
+            posts_count=row['count'],
+            last_post_at=row['last'],
+        )
+        for row in posts.values('group').annotate(
+            count=Count('pk'), last=Max('pub_date'))
+    )
+    GroupAuthorStats.objects.bulk_create(
+        GroupAuthorStats(
+            group_id=row['group'],
+            author_id=row['author'],
+            posts_count=row['count'],
+        )
+        for row in posts.values('group', 'author').annotate(
+            count=Count('pk'))
+    )
+    for group_id in GroupStats.objects.values_list('group_id', flat=True):
+        refresh_top_authors(group_id)
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+
+from core.pubsub import publish
+
+from .utils import make_cursor
+
+POSTS_CHANNEL: str = 'posts'
+
+
+def post_channel(post_id):
+    return f'post:{post_id}'
+
+
+def post_published(post):
+    """Сообщить подписчикам лент о новом посте после коммита."""
+    if not settings.LIVE_UPDATES:
+        return
+    message = {
+        'id': post.pk,
+        'author': post.author_id,
+        'group': post.group_id,
+        'cursor': make_cursor(post),
+    }
+    transaction.on_commit(lambda: publish(POSTS_CHANNEL, message))
+
+
+def comment_added(comment):
+    """Сообщить открытой странице поста о новом комментарии."""
+    if not settings.LIVE_UPDATES:
+        return
+    username = comment.author.username
+    message = {
+        'id': comment.pk,
+        'author': username,
+        'profile_url': reverse('posts:profile', args=(username,)),
+        'text': comment.text,
+    }
+    transaction.on_commit(
+        lambda: publish(post_channel(comment.post_id), message))
@@ -0,0 +1,52 @@
+import timeit
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.utils import timezone
+
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = 'Замер времени отрисовки ленты для страниц разного размера.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[10, 50, 100])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def build_posts(self, size):
+        """Посты в памяти: замеряется только отрисовка, без БД."""
+        group = Group(title='Группа', slug='bench', description='')
+        authors = [User(username=f'author{i}') for i in range(5)]
+        now = timezone.now()
+        return [
+            Post(
+                pk=i + 1,
+                text=f'Пост номер {i}\nвторая строка',
+                pub_date=now,
+                author=authors[i % len(authors)],
+                group=group if i % 2 else None,
+            )
+            for i in range(size)
+        ]
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        for size in options['sizes']:
+            page_obj = Paginator(self.build_posts(size), size).page(1)
+
+            def render():
+                render_to_string(
+                    'posts/index.html', {'page_obj': page_obj}, request)
+
+            render()
+            total = timeit.timeit(render, number=options['repeat'])
+            self.stdout.write(
+                f'{size:>4} постов: '
+                f'{total / options["repeat"] * 1000:.2f} мс на страницу'
+            )
@@ -0,0 +1,25 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts.follows import export_follows
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка подписок парами (user, author).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=('csv', 'jsonl'), default='csv')
+
+    def handle(self, *args, **options):
+        pairs = export_follows()
+        if options['format'] == 'csv':
+            writer = csv.writer(self.stdout, lineterminator='\n')
+            writer.writerow(('user', 'author'))
+            writer.writerows(pairs)
+            return
+        for user, author in pairs:
+            self.stdout.write(json.dumps(
+                {'user': user, 'author': author}, ensure_ascii=False))
@@ -0,0 +1,52 @@
+import csv
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.follows import BULK_BATCH_SIZE, bulk_follow, bulk_unfollow
+
+
+def read_pairs(lines, file_format):
+    """Поток пар (подписчик, автор) из CSV или JSONL."""
+    if file_format == 'csv':
+        for row in csv.reader(lines):
+            if len(row) >= 2 and row[:2] != ['user', 'author']:
+                yield row[0].strip(), row[1].strip()
+        return
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            yield record['user'], record['author']
+        except (ValueError, KeyError, TypeError):
+            raise CommandError(f'Строка {number}: ожидается '
+                               '{"user": ..., "author": ...}')
+
+
+class Command(BaseCommand):
+    help = 'Массовая подписка или отписка по файлу пар (user, author).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл CSV/JSONL или - для stdin.')
+        parser.add_argument(
+            '--format', choices=('csv', 'jsonl'), default=None,
+            help='По умолчанию определяется по расширению файла.')
+        parser.add_argument('--unfollow', action='store_true')
+        parser.add_argument(
+            '--batch-size', type=int, default=BULK_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        action = bulk_unfollow if options['unfollow'] else bulk_follow
+        if path == '-':
+            total = action(
+                read_pairs(sys.stdin, file_format), options['batch_size'])
+        else:
+            with open(path, newline='', encoding='utf-8') as lines:
+                total = action(
+                    read_pairs(lines, file_format), options['batch_size'])
+        self.stdout.write(f'Обработано подписок: {total}')
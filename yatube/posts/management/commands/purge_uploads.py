@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.uploads import purge_stale
+
+
+class Command(BaseCommand):
+    help = 'Удаление брошенных загрузок по частям (запускать периодически).'
+
+    def handle(self, *args, **options):
+        count = purge_stale()
+        self.stdout.write(f'Удалено загрузок: {count}')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.archive import rebuild_archive
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт индекса месяцев архива по таблице постов.'
+
+    def handle(self, *args, **options):
+        rebuild_archive()
+        self.stdout.write('Индекс архива пересчитан')
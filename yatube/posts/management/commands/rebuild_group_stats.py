@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.group_stats import rebuild_group_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт статистики групп по таблице постов.'
+
+    def handle(self, *args, **options):
+        rebuild_group_stats()
+        self.stdout.write('Статистика групп пересчитана')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.trending import refresh_trending
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт рейтинга популярных постов (запускать периодически).'
+
+    def handle(self, *args, **options):
+        count = refresh_trending()
+        self.stdout.write(f'Пересчитано постов: {count}')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.notifications import send_digests
+
+
+class Command(BaseCommand):
+    help = 'Письма-дайджесты непрочитанных уведомлений (запускать по cron).'
+
+    def handle(self, *args, **options):
+        count = send_digests()
+        self.stdout.write(f'Поставлено в очередь писем: {count}')
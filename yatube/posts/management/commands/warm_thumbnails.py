@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.tasks import warm_thumbnail
+
+
+class Command(BaseCommand):
+    help = ('Поставить в очередь построение вариантов картинок для уже '
+            'загруженных постов.')
+
+    def handle(self, *args, **options):
+        post_ids = Post.objects.exclude(image='').exclude(
+            image__isnull=True).order_by('pk').values_list(
+                'pk', flat=True).iterator()
+        count = 0
+        for post_id in post_ids:
+            warm_thumbnail.delay(post_id)
+            count += 1
+        self.stdout.write(f'Поставлено в очередь постов: {count}')
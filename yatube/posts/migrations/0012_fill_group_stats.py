@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.db.models import Count, Max
+
+TOP_AUTHORS = 3
+
+
+def fill_group_stats(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    GroupAuthorStats = apps.get_model('posts', 'GroupAuthorStats')
+    posts = Post.objects.filter(group__isnull=False).order_by()
+    GroupAuthorStats.objects.bulk_create(
+        GroupAuthorStats(
+            group_id=row['group'],
+            author_id=row['author'],
+            posts_count=row['count'],
+        )
+        for row in posts.values('group', 'author').annotate(
+            count=Count('pk'))
+    )
+    for row in posts.values('group').annotate(
+            count=Count('pk'), last=Max('pub_date')):
+        names = GroupAuthorStats.objects.filter(
+            group_id=row['group'],
+        ).order_by('-posts_count', 'author_id').values_list(
+            'author__username', flat=True)[:TOP_AUTHORS]
+        GroupStats.objects.create(
+            group_id=row['group'],
+            posts_count=row['count'],
+            last_post_at=row['last'],
+            top_authors=' '.join(names),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_auto_20261019_0940'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_group_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_postrank'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveMonth',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=32, verbose_name='Раздел')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+                ('first_id', models.PositiveIntegerField(verbose_name='Первый пост')),
+                ('last_id', models.PositiveIntegerField(verbose_name='Последний пост')),
+            ],
+            options={
+                'verbose_name': 'Месяц архива',
+                'verbose_name_plural': 'Месяцы архива',
+                'ordering': ('-month',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='archivemonth',
+            constraint=models.UniqueConstraint(fields=('scope', 'month'), name='unique_archive_month'),
+        ),
+    ]
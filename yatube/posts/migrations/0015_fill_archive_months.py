@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.db.models import Count, Max, Min
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def fill_archive_months(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ArchiveMonth = apps.get_model('posts', 'ArchiveMonth')
+    scopes = (
+        (None, lambda row: 'site'),
+        ('author', lambda row: f'author:{row["author"]}'),
+        ('group', lambda row: f'group:{row["group"]}'),
+    )
+    for field, scope in scopes:
+        posts = Post.objects.order_by()
+        if field == 'group':
+            posts = posts.filter(group__isnull=False)
+        fields = ['month'] + ([field] if field else [])
+        rows = posts.annotate(month=TruncMonth('pub_date')).values(
+            *fields).annotate(count=Count('pk'), first=Min('pk'),
+                              last=Max('pk'))
+        ArchiveMonth.objects.bulk_create(
+            ArchiveMonth(
+                scope=scope(row),
+                month=timezone.localtime(row['month']).date(),
+                posts_count=row['count'],
+                first_id=row['first'],
+                last_id=row['last'],
+            )
+            for row in rows
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_auto_20261019_0943'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_archive_months, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def fill_media_blobs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    MediaBlob = apps.get_model('posts', 'MediaBlob')
+    rows = Post.objects.exclude(image='').order_by().values(
+        'image').annotate(refs=Count('pk'))
+    MediaBlob.objects.bulk_create(
+        MediaBlob(name=row['image'], refs=row['refs']) for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_auto_20261019_0954'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_media_blobs, migrations.RunPython.noop),
+    ]
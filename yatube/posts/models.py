@@ -1,7 +1,12 @@
+import os
+import uuid
+
+from django.conf import settings
 from django.db import models
-from django.db.models import UniqueConstraint
+from django.db.models import Q, UniqueConstraint
 from django.contrib.auth import get_user_model
 from core.models import CreatedModel
+from core.storage import ContentAddressedStorage
 
 
 User = get_user_model()
@@ -30,6 +35,7 @@ class Post(models.Model):
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True,
+        db_index=True,
     )
     author = models.ForeignKey(
         User,
@@ -48,6 +54,7 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
     )
 
@@ -105,3 +112,209 @@ class Follow(CreatedModel):
                 fields=['user', 'author'], name='unique_follow'
             )
         ]
+
+
+class GroupStats(models.Model):
+    """Накопленная статистика группы для каталога групп."""
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Группа',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    last_post_at = models.DateTimeField(
+        'Последняя публикация',
+        null=True, blank=True,
+    )
+    top_authors = models.TextField(
+        'Самые активные авторы',
+        blank=True,
+        help_text='Имена пользователей через пробел',
+    )
+
+    class Meta:
+        verbose_name = 'Статистика группы'
+        verbose_name_plural = 'Статистика групп'
+
+    def top_authors_list(self):
+        return self.top_authors.split()
+
+
+class GroupAuthorStats(models.Model):
+    """Число постов автора в группе."""
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='author_stats',
+        verbose_name='Группа',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='group_stats',
+        verbose_name='Автор',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['group', 'author'], name='unique_group_author'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['group', '-posts_count'],
+                name='group_top_authors_idx',
+            )
+        ]
+
+
+class PostRank(models.Model):
+    """Рейтинг поста в ленте популярного."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rank',
+        verbose_name='Пост',
+    )
+    score = models.FloatField('Рейтинг', db_index=True)
+    updated = models.DateTimeField('Пересчитан')
+
+    class Meta:
+        verbose_name = 'Рейтинг поста'
+        verbose_name_plural = 'Рейтинги постов'
+
+
+class ArchiveMonth(models.Model):
+    """Месяц архива: число постов и границы их id.
+
+    scope — 'site', 'group:<id>' или 'author:<id>'.
+    """
+    scope = models.CharField('Раздел', max_length=32)
+    month = models.DateField('Месяц')
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    first_id = models.PositiveIntegerField('Первый пост')
+    last_id = models.PositiveIntegerField('Последний пост')
+
+    class Meta:
+        ordering = ('-month',)
+        constraints = [
+            UniqueConstraint(
+                fields=['scope', 'month'], name='unique_archive_month'
+            )
+        ]
+        verbose_name = 'Месяц архива'
+        verbose_name_plural = 'Месяцы архива'
+
+
+class MediaBlob(models.Model):
+    """Файл из хранилища картинок и число постов, которые на него ссылаются."""
+    name = models.CharField('Имя файла', max_length=100, primary_key=True)
+    refs = models.PositiveIntegerField('Число ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+
+class Upload(models.Model):
+    """Загрузка картинки по частям; файл собирается в UPLOAD_TEMP_DIR."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='uploads',
+        verbose_name='Пользователь',
+    )
+    filename = models.CharField('Имя файла', max_length=255)
+    size = models.PositiveIntegerField('Размер')
+    received = models.PositiveIntegerField('Получено байт', default=0)
+    created = models.DateTimeField('Начата', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Загрузка'
+        verbose_name_plural = 'Загрузки'
+
+    @property
+    def path(self):
+        return os.path.join(settings.UPLOAD_TEMP_DIR, f'{self.pk}.part')
+
+    @property
+    def complete(self):
+        return self.received == self.size
+
+
+class Notification(models.Model):
+    """Уведомление: новый пост избранного автора или комментарий к посту."""
+    POST = 'post'
+    COMMENT = 'comment'
+    KINDS = (
+        (POST, 'Новый пост'),
+        (COMMENT, 'Новый комментарий'),
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Получатель',
+    )
+    kind = models.CharField('Тип', max_length=8, choices=KINDS)
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор события',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Пост',
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        null=True, blank=True,
+        verbose_name='Комментарий',
+    )
+    created = models.DateTimeField('Дата', auto_now_add=True)
+    read = models.BooleanField('Прочитано', default=False)
+    emailed = models.BooleanField('Отправлено в дайджесте', default=False)
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Уведомление'
+        verbose_name_plural = 'Уведомления'
+        indexes = [
+            models.Index(
+                fields=['user', '-created'],
+                name='notification_user_idx',
+            ),
+            # Дайджест выбирает только непрочитанные и неотправленные.
+            models.Index(
+                fields=['user'],
+                name='notification_digest_idx',
+                condition=Q(read=False, emailed=False),
+            ),
+        ]
+
+
+class UnreadCounter(models.Model):
+    """Число непрочитанных уведомлений: одна строка на пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='unread_counter',
+        verbose_name='Пользователь',
+    )
+    count = models.PositiveIntegerField('Непрочитанных', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчик уведомлений'
+        verbose_name_plural = 'Счётчики уведомлений'
@@ -0,0 +1,146 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from .follows import batched
+from .models import Comment, Follow, Notification, Post, UnreadCounter, User
+
+BATCH_SIZE: int = 500
+# Сколько событий перечислять в письме; остальные — одной строкой.
+DIGEST_MAX_ITEMS: int = 20
+
+
+def bump_counters(user_ids):
+    """+1 к счётчикам непрочитанного одним UPDATE на пачку."""
+    UnreadCounter.objects.bulk_create(
+        (UnreadCounter(user_id=user_id) for user_id in user_ids),
+        ignore_conflicts=True,
+    )
+    UnreadCounter.objects.filter(user_id__in=user_ids).update(
+        count=F('count') + 1)
+
+
+def notify_followers(post_id):
+    """Уведомить подписчиков автора о новом посте, пачками по BATCH_SIZE."""
+    post = Post.objects.filter(pk=post_id).only('author_id').first()
+    if post is None:
+        return 0
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id,
+    ).values_list('user_id', flat=True).order_by('user_id').iterator()
+    count = 0
+    for batch in batched(follower_ids, BATCH_SIZE):
+        with transaction.atomic():
+            Notification.objects.bulk_create(
+                Notification(
+                    user_id=user_id,
+                    kind=Notification.POST,
+                    actor_id=post.author_id,
+                    post_id=post.pk,
+                )
+                for user_id in batch
+            )
+            bump_counters(batch)
+        count += len(batch)
+    return count
+
+
+def notify_post_author(comment_id):
+    """Уведомить автора поста о комментарии (кроме своих)."""
+    comment = Comment.objects.filter(pk=comment_id).select_related(
+        'post').only('author_id', 'post__author_id').first()
+    if comment is None or comment.author_id == comment.post.author_id:
+        return 0
+    with transaction.atomic():
+        Notification.objects.create(
+            user_id=comment.post.author_id,
+            kind=Notification.COMMENT,
+            actor_id=comment.author_id,
+            post_id=comment.post_id,
+            comment_id=comment.pk,
+        )
+        bump_counters([comment.post.author_id])
+    return 1
+
+
+def drop_unread(user_id, count):
+    """-count к счётчику непрочитанного, но не ниже нуля."""
+    UnreadCounter.objects.filter(user_id=user_id).update(
+        count=Greatest(F('count') - count, 0))
+
+
+def unread_count(user):
+    return UnreadCounter.objects.filter(user_id=user.pk).values_list(
+        'count', flat=True).first() or 0
+
+
+@transaction.atomic
+def mark_read(user, notification_ids):
+    """Отметить прочитанными показанные уведомления и уменьшить счётчик."""
+    count = Notification.objects.filter(
+        user=user, pk__in=notification_ids, read=False).update(read=True)
+    if count:
+        drop_unread(user.pk, count)
+    return count
+
+
+def digest_message(user, notifications):
+    context = {
+        'user': user,
+        'posts': [
+            item for item in notifications if item.kind == Notification.POST
+        ][:DIGEST_MAX_ITEMS],
+        'comments': [
+            item for item in notifications
+            if item.kind == Notification.COMMENT
+        ][:DIGEST_MAX_ITEMS],
+        'total': len(notifications),
+        'notifications_url': settings.SITE_URL + reverse(
+            'posts:notifications'),
+    }
+    context['rest'] = context['total'] - len(context['posts']) - len(
+        context['comments'])
+    return EmailMessage(
+        subject=f'Yatube: {len(notifications)} новых событий',
+        body=render_to_string('posts/email/digest.txt', context),
+        to=[user.email],
+    )
+
+
+def send_digests():
+    """Одно письмо на пользователя со всеми непрочитанными событиями.
+
+    Событие попадает в дайджест один раз; у пользователей без почты
+    события тоже помечаются, чтобы не выбирать их снова. Помечаются только
+    выбранные события: пришедшие во время рассылки уйдут в следующей.
+    """
+    if not settings.NOTIFICATION_EMAIL_DIGEST:
+        return 0
+    pending = Notification.objects.filter(read=False, emailed=False)
+    user_ids = pending.values_list(
+        'user_id', flat=True).order_by('user_id').distinct()
+    sent = 0
+    connection = get_connection()
+    for batch in batched(user_ids.iterator(), BATCH_SIZE):
+        by_user = defaultdict(list)
+        selected = []
+        for notification in pending.filter(user_id__in=batch).select_related(
+                'actor', 'post'):
+            by_user[notification.user_id].append(notification)
+            selected.append(notification.pk)
+        users = User.objects.in_bulk(batch)
+        messages = [
+            digest_message(users[user_id], notifications)
+            for user_id, notifications in by_user.items()
+            if users[user_id].email
+        ]
+        connection.send_messages(messages)
+        sent += len(messages)
+        Notification.objects.filter(pk__in=selected).update(emailed=True)
+    return sent
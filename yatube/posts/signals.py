@@ -0,0 +1,97 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.storage import ContentAddressedStorage, content_claimed
+
+from . import archive, blobs, group_stats, live, notifications
+from .feeds import invalidate_feeds
+from .follows import invalidate_following
+from .models import Comment, Follow, Notification, Post
+from .tasks import notify_new_comment, notify_new_post, rescore_author
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    """Сброс кэша подписок при изменении Follow в обход follows.py."""
+    invalidate_following(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """Отписка меняет рейтинг постов автора, а refresh её не видит."""
+    author_id = instance.author_id
+    transaction.on_commit(lambda: rescore_author.delay(author_id))
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    """Каскадное удаление с постом, комментарием или автором события."""
+    if not instance.read:
+        notifications.drop_unread(instance.user_id, 1)
+
+
+@receiver(content_claimed, sender=ContentAddressedStorage)
+def image_claimed(sender, name, **kwargs):
+    """Ссылку на загруженную картинку берёт само хранилище."""
+    blobs.acquire(name)
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved_post(sender, instance, **kwargs):
+    """Запоминаем прежние группу и картинку редактируемого поста."""
+    # Незакоммиченный файл сохранит хранилище, и ссылку возьмёт оно.
+    instance._image_uploaded = bool(
+        instance.image) and not instance.image._committed
+    if instance.pk is not None:
+        instance._saved_group_id, instance._saved_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image').first() or (None, ''))
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    old_image = getattr(instance, '_saved_image', '')
+    uploaded = getattr(instance, '_image_uploaded', False)
+    replaced = uploaded or old_image != instance.image.name
+    if replaced and not uploaded:
+        blobs.acquire(instance.image.name)
+    if replaced and not created:
+        blobs.release(old_image)
+    scopes = archive.post_scopes(instance.author_id, instance.group_id)
+    if created:
+        group_stats.post_added(
+            instance.group_id, instance.author_id, instance.pub_date)
+        archive.post_added(instance)
+        invalidate_feeds(scopes)
+        live.post_published(instance)
+        transaction.on_commit(lambda: notify_new_post.delay(instance.pk))
+        return
+    old_group_id = getattr(instance, '_saved_group_id', None)
+    if old_group_id is not None:
+        scopes.append(archive.group_scope(old_group_id))
+    invalidate_feeds(scopes)
+    if old_group_id == instance.group_id:
+        return
+    group_stats.post_removed(
+        old_group_id, instance.author_id, instance.pub_date)
+    group_stats.post_added(
+        instance.group_id, instance.author_id, instance.pub_date)
+    archive.group_changed(instance, old_group_id)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    blobs.release(instance.image.name)
+    group_stats.post_removed(
+        instance.group_id, instance.author_id, instance.pub_date)
+    archive.post_removed(instance)
+    invalidate_feeds(
+        archive.post_scopes(instance.author_id, instance.group_id))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        live.comment_added(instance)
+        transaction.on_commit(lambda: notify_new_comment.delay(instance.pk))
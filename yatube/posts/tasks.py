@@ -0,0 +1,37 @@
+from taskqueue.registry import task
+
+from . import notifications, trending
+from .models import Post
+from .templatetags.posts_tags import responsive_image
+
+
+@task
+def warm_thumbnail(post_id):
+    """Заранее построить варианты картинки, чтобы лента не делала это сама."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        responsive_image(post.image)
+
+
+@task
+def notify_new_post(post_id):
+    """Уведомления подписчикам о новом посте."""
+    notifications.notify_followers(post_id)
+
+
+@task
+def notify_new_comment(comment_id):
+    """Уведомление автору поста о комментарии."""
+    notifications.notify_post_author(comment_id)
+
+
+@task
+def send_notification_digests():
+    """Письма-дайджесты непрочитанных уведомлений."""
+    notifications.send_digests()
+
+
+@task
+def rescore_author(author_id):
+    """Пересчёт рейтинга постов автора после отписки."""
+    trending.rescore_author(author_id)
@@ -0,0 +1,177 @@
+import logging
+from functools import lru_cache
+
+from django import template
+from django.conf import settings
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+from posts.utils import make_cursor
+from PIL import features
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.conf import settings as sorl_settings
+
+logger = logging.getLogger('sorl.thumbnail')
+
+register = template.Library()
+
+CARDS_TEMPLATE: str = 'posts/includes/post_cards.html'
+THUMBNAIL_GEOMETRY: str = '960x339'
+THUMBNAIL_OPTIONS: dict = {'crop': 'center', 'upscale': True}
+PICTURE_TEMPLATE: str = 'posts/includes/picture.html'
+LIVE_TEMPLATE: str = 'posts/includes/live_updates.html'
+# Ширины вариантов картинки для srcset; пропорции как у THUMBNAIL_GEOMETRY.
+IMAGE_WIDTHS: tuple = (320, 640, 960)
+IMAGE_SIZES: str = '(max-width: 960px) 100vw, 960px'
+# Современные форматы, которые умеет собранный Pillow, в порядке выбора.
+MODERN_FORMATS: tuple = tuple(
+    (image_format, f'image/{image_format.lower()}')
+    for image_format in ('WEBP',) if features.check(image_format.lower())
+)
+
+
+@lru_cache(maxsize=None)
+def _compiled_cards_template():
+    return get_template(CARDS_TEMPLATE)
+
+
+def cards_template():
+    """Шаблон списка карточек, скомпилированный один раз на процесс."""
+    if settings.DEBUG:
+        return get_template(CARDS_TEMPLATE)
+    return _compiled_cards_template()
+
+
+def _thumbnail(image, geometry, **options):
+    try:
+        return get_thumbnail(
+            image, geometry, **THUMBNAIL_OPTIONS, **options).url
+    except Exception:
+        if sorl_settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception('Thumbnail failed for %s', image)
+        return None
+
+
+def thumbnail_url(image):
+    """URL миниатюры картинки поста или None."""
+    if not image:
+        return None
+    return _thumbnail(image, THUMBNAIL_GEOMETRY)
+
+
+def variant_geometry(width):
+    full_width, full_height = map(int, THUMBNAIL_GEOMETRY.split('x'))
+    return f'{width}x{round(width * full_height / full_width)}'
+
+
+def _srcset(image, **options):
+    candidates = []
+    for width in IMAGE_WIDTHS:
+        url = _thumbnail(image, variant_geometry(width), **options)
+        if url is None:
+            return None
+        candidates.append(f'{url} {width}w')
+    return ', '.join(candidates)
+
+
+def responsive_image(image):
+    """Варианты картинки для <picture>: srcset по ширинам и форматам.
+
+    Варианты строятся заранее задачей warm_thumbnail; здесь sorl только
+    находит их в kvstore.
+    """
+    if not image:
+        return None
+    src = thumbnail_url(image)
+    srcset = src and _srcset(image)
+    if srcset is None:
+        return None
+    width, height = THUMBNAIL_GEOMETRY.split('x')
+    sources = []
+    for image_format, mime_type in MODERN_FORMATS:
+        format_srcset = _srcset(image, format=image_format)
+        if format_srcset:
+            sources.append({'type': mime_type, 'srcset': format_srcset})
+    return {
+        'src': src,
+        'srcset': srcset,
+        'sources': sources,
+        'sizes': IMAGE_SIZES,
+        'width': width,
+        'height': height,
+    }
+
+
+def _reverse_once(urls, name, arg):
+    """reverse() с запоминанием результата в пределах одной отрисовки."""
+    key = (name, arg)
+    if key not in urls:
+        urls[key] = reverse(name, args=(arg,))
+    return urls[key]
+
+
+def card_context(post, urls, show_group=True):
+    """Контекст карточки: все URL и миниатюра вычислены заранее."""
+    author = post.author
+    group = post.group if show_group else None
+    return {
+        'post': post,
+        'author_name': author.get_full_name() or author.username,
+        'profile_url': _reverse_once(urls, 'posts:profile', author.username),
+        'detail_url': reverse('posts:post_detail', args=(post.pk,)),
+        'group': group,
+        'group_url': (
+            _reverse_once(urls, 'posts:group_list', group.slug)
+            if group else None
+        ),
+        'image': responsive_image(post.image),
+    }
+
+
+def post_card_contexts(posts, show_group=True):
+    urls = {}
+    return [card_context(post, urls, show_group) for post in posts]
+
+
+def render_post_cards(posts, show_group=True):
+    """Отрисовка списка постов за один проход одним шаблоном."""
+    return mark_safe(cards_template().render(
+        {'cards': post_card_contexts(posts, show_group)}).strip())
+
+
+@register.simple_tag
+def post_cards(posts, show_group=True):
+    """Контексты карточек для цикла в шаблоне ленты.
+
+    Карточки рисуются в том же проходе, что и страница: include внутри
+    цикла компилирует шаблон карточки один раз за отрисовку.
+    """
+    return post_card_contexts(posts, show_group)
+
+
+@register.inclusion_tag(PICTURE_TEMPLATE)
+def picture(image):
+    """<picture> со srcset и ленивой загрузкой для картинки поста."""
+    return {'image': responsive_image(image)}
+
+
+@register.inclusion_tag(LIVE_TEMPLATE)
+def live_feed(page_obj, events_url, fragment_url):
+    """Живые обновления ленты: только на первой странице."""
+    if not settings.LIVE_UPDATES or page_obj.number != 1:
+        return {}
+    newest = page_obj[0] if len(page_obj) else None
+    return {
+        'events_url': events_url,
+        'fragment_url': fragment_url,
+        'since': make_cursor(newest) if newest else '0-0',
+    }
+
+
+@register.inclusion_tag(LIVE_TEMPLATE)
+def live_comments(post):
+    """Новые комментарии к посту без перезагрузки страницы."""
+    if not settings.LIVE_UPDATES:
+        return {}
+    return {'events_url': reverse('posts:post_events', args=(post.pk,))}
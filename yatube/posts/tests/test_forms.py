@@ -1,8 +1,12 @@
+import json
+import os
 import shutil
 import tempfile
+from unittest import mock
 
 from ..forms import PostForm
-from ..models import Post, Group, Comment
+from ..models import Post, Group, Comment, Upload
+from ..uploads import AssembledUpload
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
@@ -134,3 +138,106 @@ class PostFormTests(TestCase):
             Comment.objects.filter(
                 text=form_data['text'],
             ).exists())
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    UPLOAD_TEMP_DIR=os.path.join(TEMP_MEDIA_ROOT, 'uploads'),
+    UPLOAD_CHUNK_SIZE=16,
+)
+class ChunkedUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='uploader')
+        cls.gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def start(self, filename='photo.gif', size=None):
+        return self.client.post(
+            reverse('posts:upload_start'),
+            json.dumps({'filename': filename, 'size': size or len(self.gif)}),
+            content_type='application/json',
+        )
+
+    def put(self, upload_id, start, end):
+        return self.client.put(
+            reverse('posts:upload_chunk', args=(upload_id,)),
+            self.gif[start:end + 1],
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{len(self.gif)}',
+        )
+
+    def test_resumable_upload_attaches_to_post(self):
+        """Части принимаются по порядку, повтор возвращает смещение."""
+        response = self.start()
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.json()['id']
+        self.assertEqual(self.put(upload_id, 0, 15).json()['offset'], 16)
+        repeated = self.put(upload_id, 0, 15)
+        self.assertEqual(repeated.status_code, 409)
+        self.assertEqual(repeated.json()['offset'], 16)
+        state = self.client.get(
+            reverse('posts:upload_chunk', args=(upload_id,))).json()
+        self.assertEqual(state['offset'], 16)
+        size = len(self.gif)
+        self.assertEqual(self.put(upload_id, 16, 31).json()['offset'], 32)
+        self.assertEqual(
+            self.put(upload_id, 32, size - 1).json()['offset'], size)
+        self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Пост из загрузки', 'upload': upload_id},
+        )
+        post = Post.objects.get(text='Пост из загрузки')
+        with post.image.open('rb') as image:
+            self.assertEqual(image.read(), self.gif)
+        self.assertFalse(Upload.objects.filter(pk=upload_id).exists())
+        self.assertFalse(os.path.exists(os.path.join(
+            TEMP_MEDIA_ROOT, 'uploads', f'{upload_id}.part')))
+
+    def test_upload_is_closed_when_form_is_invalid(self):
+        upload_id = self.start().json()['id']
+        for start in range(0, len(self.gif), 16):
+            self.put(upload_id, start, min(start + 15, len(self.gif) - 1))
+        with mock.patch.object(
+                AssembledUpload, 'close', autospec=True) as close:
+            response = self.client.post(
+                reverse('posts:post_create'),
+                {'text': '', 'upload': upload_id},
+            )
+        self.assertEqual(response.status_code, 200)
+        close.assert_called_once()
+        self.assertTrue(Upload.objects.filter(pk=upload_id).exists())
+
+    def test_first_chunk_is_validated(self):
+        self.assertEqual(self.start('notes.txt').status_code, 415)
+        self.assertEqual(self.start(size=10 ** 9).status_code, 413)
+        upload_id = self.start().json()['id']
+        response = self.client.put(
+            reverse('posts:upload_chunk', args=(upload_id,)),
+            b'<html>not image',
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes 0-14/{len(self.gif)}',
+        )
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(response.json()['offset'], 0)
+
+    def test_upload_belongs_to_its_user(self):
+        upload_id = self.start().json()['id']
+        self.client.force_login(User.objects.create_user(username='other'))
+        self.assertEqual(self.put(upload_id, 0, 15).status_code, 404)
+        self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Чужая загрузка', 'upload': upload_id},
+        )
+        self.assertFalse(
+            Post.objects.filter(text='Чужая загрузка').exclude(
+                image='').exists())
@@ -1,7 +1,24 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 
-from ..models import Group, Post
+from ..archive import (
+    SITE_SCOPE, author_scope, group_scope, month_start, rebuild_archive
+)
+from ..group_stats import rebuild_group_stats
+from ..models import (
+    ArchiveMonth, Comment, Follow, Group, GroupStats, MediaBlob, Post,
+    PostRank
+)
+from ..templatetags.posts_tags import thumbnail_url
+from ..trending import WINDOW, refresh_trending
 
 User = get_user_model()
 
@@ -29,3 +46,224 @@ class PostModelTest(TestCase):
         for field, expected_value in test_models:
             with self.subTest(field=field):
                 self.assertEqual(field, expected_value)
+
+
+class GroupStatsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = User.objects.create_user(username='first')
+        cls.second = User.objects.create_user(username='second')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='')
+        cls.other_group = Group.objects.create(
+            title='Другая', slug='other', description='')
+
+    def test_stats_follow_post_changes(self):
+        """Статистика групп обновляется при создании, правке и удалении."""
+        Post.objects.create(author=self.first, text='1', group=self.group)
+        Post.objects.create(author=self.second, text='2', group=self.group)
+        last = Post.objects.create(
+            author=self.second, text='3', group=self.group)
+        stats = GroupStats.objects.get(group=self.group)
+        self.assertEqual(stats.posts_count, 3)
+        self.assertEqual(stats.last_post_at, last.pub_date)
+        self.assertEqual(stats.top_authors_list(), ['second', 'first'])
+        last.group = self.other_group
+        last.save()
+        stats.refresh_from_db()
+        self.assertEqual(stats.posts_count, 2)
+        self.assertLess(stats.last_post_at, last.pub_date)
+        self.assertEqual(
+            GroupStats.objects.get(group=self.other_group).posts_count, 1)
+        Post.objects.filter(author=self.first).delete()
+        stats.refresh_from_db()
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.top_authors_list(), ['second'])
+
+    def test_rebuild_matches_incremental(self):
+        for number in range(4):
+            Post.objects.create(
+                author=(self.first, self.second)[number % 2],
+                text=str(number),
+                group=self.group,
+            )
+        expected = list(GroupStats.objects.values())
+        rebuild_group_stats()
+        self.assertEqual(list(GroupStats.objects.values()), expected)
+
+
+class PostRankTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def test_refresh_is_incremental(self):
+        """Пересчитываются только посты с новой активностью."""
+        quiet = Post.objects.create(author=self.author, text='Тихий')
+        busy = Post.objects.create(author=self.author, text='Обсуждаемый')
+        self.assertEqual(refresh_trending(), 2)
+        self.assertGreater(busy.rank.score, quiet.rank.score)
+        for _ in range(3):
+            Comment.objects.create(post=quiet, author=self.reader, text='!')
+        self.assertEqual(refresh_trending(), 1)
+        quiet.rank.refresh_from_db()
+        busy.rank.refresh_from_db()
+        self.assertGreater(quiet.rank.score, busy.rank.score)
+
+    def test_old_posts_leave_ranking(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        refresh_trending()
+        refresh_trending(now=timezone.now() + WINDOW * 2)
+        self.assertFalse(PostRank.objects.filter(post=post).exists())
+
+    def test_unfollow_rescores_author_posts(self):
+        """Отписка сразу пересчитывает рейтинг постов автора."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        refresh_trending()
+        score = PostRank.objects.get(post=post).score
+        updated = PostRank.objects.get(post=post).updated
+        with self.settings(TASKS_ALWAYS_EAGER=True), mock.patch(
+                'posts.signals.transaction.on_commit', lambda func: func()):
+            follow.delete()
+        rank = PostRank.objects.get(post=post)
+        self.assertLess(rank.score, score)
+        self.assertEqual(rank.updated, updated)
+
+    def test_new_comment_counts_all_comments(self):
+        """Новый комментарий не обнуляет счёт старых."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        for _ in range(5):
+            Comment.objects.create(post=post, author=self.reader, text='!')
+        refresh_trending()
+        score = PostRank.objects.get(post=post).score
+        Comment.objects.create(post=post, author=self.reader, text='!')
+        self.assertEqual(refresh_trending(), 1)
+        self.assertGreater(PostRank.objects.get(post=post).score, score)
+
+
+class ArchiveMonthTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='')
+
+    def test_month_index_follows_post_changes(self):
+        """Индекс месяцев обновляется при создании и удалении постов."""
+        posts = [
+            Post.objects.create(
+                author=self.author, text=str(number), group=self.group)
+            for number in range(3)
+        ]
+        month = month_start(posts[0].pub_date)
+        scopes = (
+            SITE_SCOPE,
+            author_scope(self.author.pk),
+            group_scope(self.group.pk),
+        )
+        for scope in scopes:
+            with self.subTest(scope=scope):
+                row = ArchiveMonth.objects.get(scope=scope, month=month)
+                self.assertEqual(
+                    (row.posts_count, row.first_id, row.last_id),
+                    (3, posts[0].pk, posts[2].pk),
+                )
+        posts[2].delete()
+        row = ArchiveMonth.objects.get(scope=SITE_SCOPE, month=month)
+        self.assertEqual((row.posts_count, row.last_id), (2, posts[1].pk))
+        fields = ('scope', 'month', 'posts_count', 'first_id', 'last_id')
+        expected = list(ArchiveMonth.objects.values_list(*fields))
+        rebuild_archive()
+        self.assertCountEqual(
+            ArchiveMonth.objects.values_list(*fields), expected)
+
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class MediaBlobTest(TransactionTestCase):
+    """on_commit срабатывает только вне обёртки TestCase."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        self.author = User.objects.create_user(username='author')
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def create_post(self, filename, content=SMALL_GIF):
+        return Post.objects.create(
+            author=self.author, text=filename,
+            image=SimpleUploadedFile(filename, content, 'image/gif'))
+
+    def image_exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.create_post('cat.gif')
+        second = self.create_post('Other-Name.GIF')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.gif$')
+        self.assertEqual(
+            thumbnail_url(first.image), thumbnail_url(second.image))
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).refs, 2)
+        self.assertEqual(
+            len(os.listdir(os.path.dirname(first.image.path))), 1)
+
+    def test_last_reference_frees_file(self):
+        first = self.create_post('a.gif')
+        second = self.create_post('b.gif')
+        name = first.image.name
+        thumbnail = thumbnail_url(first.image)[len(settings.MEDIA_URL):]
+        first.delete()
+        self.assertTrue(self.image_exists(name))
+        second.delete()
+        self.assertFalse(self.image_exists(name))
+        self.assertFalse(self.image_exists(thumbnail))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_replacing_image_releases_old_one(self):
+        post = self.create_post('a.gif')
+        old_name = post.image.name
+        post.image = SimpleUploadedFile(
+            'b.gif', SMALL_GIF + b'\x00', 'image/gif')
+        post.save()
+        self.assertFalse(self.image_exists(old_name))
+        self.assertEqual(MediaBlob.objects.get(name=post.image.name).refs, 1)
+        post.text = 'без смены картинки'
+        post.save()
+        self.assertEqual(MediaBlob.objects.get(name=post.image.name).refs, 1)
+
+    def test_upload_racing_last_release_keeps_file(self):
+        first = self.create_post('a.gif')
+        name = first.image.name
+        storage = Post._meta.get_field('image').storage
+        exists = storage.exists
+
+        def release_after_check(checked_name):
+            # Второй пост увидел файл, и тут же удаляют первый.
+            found = exists(checked_name)
+            if Post.objects.filter(pk=first.pk).exists():
+                first.delete()
+            return found
+
+        with mock.patch.object(storage, 'exists', release_after_check):
+            second = self.create_post('b.gif')
+        self.assertEqual(second.image.name, name)
+        self.assertTrue(self.image_exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).refs, 1)
+        second.delete()
+        self.assertFalse(self.image_exists(name))
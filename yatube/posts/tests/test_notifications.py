@@ -0,0 +1,143 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Notification, Post, UnreadCounter
+from ..notifications import (
+    digest_message, notify_followers, notify_post_author, send_digests,
+    unread_count
+)
+from ..tasks import notify_new_post
+
+User = get_user_model()
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class NotificationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com')
+        cls.followers = [
+            User.objects.create_user(
+                username=f'reader{number}', email=f'r{number}@example.com')
+            for number in range(5)
+        ]
+        Follow.objects.bulk_create(
+            Follow(user=user, author=cls.author) for user in cls.followers)
+
+    def test_new_post_notifies_followers_in_batches(self):
+        """Уведомления и счётчики пишутся пачкой, а не по одному."""
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        with self.settings(TASKS_ALWAYS_EAGER=True), \
+                CaptureQueriesContext(connection) as queries:
+            notify_new_post.delay(post.pk)
+        self.assertLessEqual(len(queries), 8)
+        for user in self.followers:
+            self.assertEqual(unread_count(user), 1)
+        self.assertEqual(
+            Notification.objects.filter(
+                post=post, kind=Notification.POST).count(),
+            len(self.followers))
+        self.assertEqual(unread_count(self.author), 0)
+
+    def test_comment_notifies_post_author_only(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        own = Comment.objects.create(post=post, author=self.author, text='я')
+        self.assertEqual(notify_post_author(own.pk), 0)
+        comment = Comment.objects.create(
+            post=post, author=self.followers[0], text='Отлично')
+        self.assertEqual(notify_post_author(comment.pk), 1)
+        self.assertEqual(unread_count(self.author), 1)
+
+    def test_page_marks_notifications_read(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        notify_followers(post.pk)
+        reader = self.followers[0]
+        self.client.force_login(reader)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Уведомления (1)')
+        response = self.client.get(reverse('posts:notifications'))
+        self.assertContains(response, 'новый пост')
+        self.assertFalse(response.context['page_obj'][0].read)
+        self.assertEqual(unread_count(reader), 0)
+        self.assertFalse(
+            Notification.objects.filter(user=reader, read=False).exists())
+
+    def test_only_shown_notifications_are_marked_read(self):
+        """Уведомления с других страниц остаются непрочитанными."""
+        for number in range(3):
+            notify_followers(
+                Post.objects.create(author=self.author, text=f'П{number}').pk)
+        reader = self.followers[0]
+        self.client.force_login(reader)
+        response = self.client.get(
+            reverse('posts:notifications'), {'limit': 2})
+        shown = [notification.pk for notification in response.context[
+            'page_obj']]
+        self.assertEqual(len(shown), 2)
+        self.assertEqual(unread_count(reader), 1)
+        self.assertEqual(
+            list(Notification.objects.filter(
+                user=reader, read=False).values_list('pk', flat=True)),
+            list(Notification.objects.filter(user=reader).exclude(
+                pk__in=shown).values_list('pk', flat=True)),
+        )
+
+    def test_digest_is_one_email_per_user(self):
+        for number in range(3):
+            post = Post.objects.create(author=self.author, text=f'П{number}')
+            notify_followers(post.pk)
+        self.followers[1].email = ''
+        self.followers[1].save()
+        comment = Comment.objects.create(
+            post=post, author=self.followers[0], text='Отлично')
+        notify_post_author(comment.pk)
+        self.assertEqual(send_digests(), len(self.followers))
+        self.assertEqual(len(mail.outbox), len(self.followers))
+        by_address = {message.to[0]: message for message in mail.outbox}
+        self.assertIn('П2', by_address['r0@example.com'].body)
+        self.assertIn('к вашим постам', by_address['author@example.com'].body)
+        # Повторный запуск не шлёт уже отправленное.
+        self.assertEqual(send_digests(), 0)
+        self.assertEqual(UnreadCounter.objects.get(
+            user=self.followers[2]).count, 3)
+
+    def test_digest_marks_only_rendered_notifications(self):
+        """Событие, пришедшее во время рассылки, уйдёт следующим письмом."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        notify_followers(post.pk)
+        reader = self.followers[0]
+
+        def render_and_notify(user, notifications):
+            if user == reader:
+                notify_post_author(Comment.objects.create(
+                    post=Post.objects.create(author=reader, text='Свой'),
+                    author=self.author, text='Новый').pk)
+            return digest_message(user, notifications)
+
+        with mock.patch(
+                'posts.notifications.digest_message', render_and_notify):
+            send_digests()
+        self.assertTrue(Notification.objects.filter(
+            user=reader, kind=Notification.COMMENT, emailed=False).exists())
+        self.assertEqual(send_digests(), 1)
+
+    def test_deleting_post_drops_unread_counters(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        notify_followers(post.pk)
+        notify_followers(
+            Post.objects.create(author=self.author, text='Второй').pk)
+        reader = self.followers[0]
+        self.client.force_login(reader)
+        self.client.get(reverse('posts:notifications'), {'limit': 1})
+        self.assertEqual(unread_count(reader), 1)
+        post.delete()
+        self.assertEqual(unread_count(reader), 0)
+        self.assertEqual(unread_count(self.followers[1]), 1)
@@ -1,15 +1,30 @@
+import json
+import os
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.template import Engine
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django.conf import settings
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django import forms
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
+from posts.archive import SITE_SCOPE
+from posts.feeds import FEED_CACHE_TIMEOUT, feed_updated, invalidate_feeds
+from posts.follows import is_following
 from posts.models import Post, Group, Follow
+from posts.templatetags.posts_tags import IMAGE_WIDTHS, responsive_image
+from posts.utils import make_cursor
+from posts.trending import refresh_trending
 
 User = get_user_model()
 
@@ -108,6 +123,28 @@ class PostPagesTests(TestCase):
         self.assertEqual(response.context.get('post').group, self.post.group)
         self.assertEqual(response.context.get('post').image, self.post.image)
 
+    def test_feed_images_have_srcset(self):
+        """Картинки в ленте и на странице поста отдаются набором ширин."""
+        image = responsive_image(self.post.image)
+        self.assertEqual(len(image['srcset'].split(', ')), len(IMAGE_WIDTHS))
+        for width in IMAGE_WIDTHS:
+            self.assertIn(f' {width}w', image['srcset'])
+        for url in (reverse('posts:index'),
+                    reverse('posts:post_detail', args=(self.post.pk,))):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, f'srcset="{image["srcset"]}"')
+                self.assertContains(response, 'loading="lazy"')
+
+    def test_warm_thumbnails_command(self):
+        """Команда ставит в очередь только посты с картинкой."""
+        Post.objects.create(author=self.user, text='Без картинки')
+        with mock.patch(
+                'posts.management.commands.warm_thumbnails.'
+                'warm_thumbnail.delay') as delay:
+            call_command('warm_thumbnails', stdout=StringIO())
+        delay.assert_called_once_with(self.post.pk)
+
     def test_post_list_pages_show_correct_context(self):
         """Шаблоны со списками постов сформированы с правильным контекстом."""
         addresses = {
@@ -230,3 +267,354 @@ class PostPagesTests(TestCase):
         context = response.context['page_obj']
         self.assertNotIn(posts[0], context)
         self.assertIn(posts[1], context)
+
+    def test_feed_cards_render_in_one_pass(self):
+        """Шаблон карточки ищется один раз на страницу, а не на пост."""
+        for number in range(5):
+            Post.objects.create(
+                author=self.author, text=f'Пост {number}', group=self.group)
+        engine = Engine.get_default()
+        with mock.patch.object(
+                engine, 'find_template', wraps=engine.find_template) as find:
+            response = self.authorized_client.get(
+                reverse('posts:profile', args=(self.author.username,)))
+        self.assertEqual(response.content.decode().count('<article>'), 6)
+        found = [call.args[0] for call in find.call_args_list]
+        self.assertEqual(found.count('posts/includes/post_card.html'), 1)
+        self.assertLessEqual(found.count('posts/includes/picture.html'), 1)
+        self.assertContains(response, f'Группа {self.group.title}')
+
+    def test_feed_cards_without_extra_queries(self):
+        """Карточки ленты не делают запросов на автора и группу."""
+        self.client.get(reverse('posts:index'))
+        cache.clear()
+        with CaptureQueriesContext(connection) as one_post:
+            self.client.get(reverse('posts:index'))
+        for number in range(5):
+            Post.objects.create(
+                author=User.objects.create_user(username=f'user{number}'),
+                text='Пост ленты',
+                group=self.group,
+            )
+        cache.clear()
+        with self.assertNumQueries(len(one_post)):
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response, reverse('posts:group_list', args=(self.group.slug,)))
+        self.assertContains(
+            response, reverse('posts:post_detail', args=(self.post.pk,)))
+
+    def test_paginator_limit(self):
+        """Размер страницы задаётся ?limit= и ограничен сверху."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {number}')
+            for number in range(60)
+        )
+        limits = {'5': 5, '0': 10, 'abc': 10, '1000': 50}
+        for limit, expected in limits.items():
+            with self.subTest(limit=limit):
+                response = self.client.get(
+                    reverse('posts:profile', args=(self.author.username,)),
+                    {'limit': limit},
+                )
+                self.assertEqual(len(response.context['page_obj']), expected)
+
+    def test_paginator_prefetches_next_page(self):
+        """Следующая страница берётся из кэша и не сдвигается постами."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {number}')
+            for number in range(25)
+        )
+        url = reverse('posts:profile', args=(self.author.username,))
+        self.client.get(url)
+        expected = list(self.author.posts.all()[10:20])
+        Post.objects.create(author=self.author, text='Свежий пост')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'page': 2})
+        self.assertEqual(list(response.context['page_obj']), expected)
+        self.assertFalse(any(
+            'OFFSET' in query['sql'] for query in queries.captured_queries))
+        # Другой ?limit= и другой пользователь — свои страницы.
+        response = self.client.get(url, {'page': 2, 'limit': 5})
+        self.assertEqual(len(response.context['page_obj']), 5)
+        response = self.authorized_client.get(url, {'page': 2})
+        self.assertNotEqual(list(response.context['page_obj']), expected)
+
+    def test_feed_fragments_walk_by_cursor(self):
+        """Подгрузка ленты по курсору отдаёт все посты ровно один раз."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {number}', group=self.group)
+            for number in range(12)
+        )
+        urls = (
+            reverse('posts:index_fragment'),
+            reverse('posts:group_fragment', args=(self.group.slug,)),
+            reverse('posts:profile_fragment', args=(self.author.username,)),
+        )
+        expected = [
+            reverse('posts:post_detail', args=(post.pk,))
+            for post in Post.objects.order_by('-pub_date', '-pk')
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                html, cursor = '', ''
+                for _ in range(len(expected)):
+                    data = self.client.get(
+                        url, {'cursor': cursor, 'limit': 5}).json()
+                    html += data['html']
+                    cursor = data['next']
+                    if cursor is None:
+                        break
+                self.assertIsNone(cursor)
+                self.assertEqual(html.count('подробная'), len(expected))
+                found = sorted(
+                    expected, key=lambda link: html.index(f'href="{link}"'))
+                self.assertEqual(found, expected)
+                self.assertNotIn('<html', html)
+
+    def test_fragments_of_unknown_group_or_author_are_404(self):
+        for url in (reverse('posts:group_fragment', args=('nonexistent',)),
+                    reverse('posts:profile_fragment', args=('nobody',))):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_fragment_since_returns_only_new_posts(self):
+        """?since= отдаёт посты новее курсора и курсор самого нового."""
+        cursor = make_cursor(self.post)
+        new_posts = [
+            Post.objects.create(author=self.author, text=f'Новый {number}')
+            for number in range(3)
+        ]
+        data = self.authorized_client.get(
+            reverse('posts:index_fragment'), {'since': cursor}).json()
+        self.assertEqual(data['latest'], make_cursor(new_posts[-1]))
+        for post in new_posts:
+            self.assertIn(
+                reverse('posts:post_detail', args=(post.pk,)), data['html'])
+        self.assertNotIn(
+            reverse('posts:post_detail', args=(self.post.pk,)), data['html'])
+        data = self.authorized_client.get(
+            reverse('posts:follow_fragment'), {'since': cursor}).json()
+        self.assertEqual(data, {'html': '', 'latest': cursor})
+
+    @override_settings(
+        PUBSUB_BACKEND={'BACKEND': 'core.pubsub.LocalBackend'},
+        SSE_MAX_DURATION=0.1, SSE_KEEPALIVE=0.05, LIVE_UPDATES=True,
+    )
+    def test_live_events(self):
+        """Новые посты и комментарии приходят в SSE-потоки."""
+        followed = self.follow.author
+        with mock.patch(
+                'posts.live.transaction.on_commit', lambda func: func()):
+            Post.objects.create(author=self.author, text='не из подписок')
+            followed_post = Post.objects.create(author=followed, text='Пост')
+            self.authorized_client.post(
+                reverse('posts:add_comment', args=(self.post.pk,)),
+                {'text': 'Живой комментарий'},
+            )
+        cases = (
+            (reverse('posts:feed_events'), 'event: post', 2),
+            (reverse('posts:follow_events'), f'"id": {followed_post.pk}', 1),
+            (reverse('posts:post_events', args=(self.post.pk,)),
+             'Живой комментарий', 1),
+        )
+        for url, expected, count in cases:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(
+                    url, HTTP_LAST_EVENT_ID='0')
+                self.assertEqual(
+                    response['Content-Type'], 'text/event-stream')
+                stream = b''.join(response.streaming_content).decode()
+                self.assertIn(expected, stream)
+                self.assertEqual(stream.count('\nevent: '), count)
+
+    def test_live_updates_are_off_by_default(self):
+        """Без LIVE_UPDATES нет ни скрипта на страницах, ни потоков."""
+        for url in (reverse('posts:index'), reverse('posts:follow_index'),
+                    reverse('posts:post_detail', args=(self.post.pk,))):
+            with self.subTest(url=url):
+                cache.clear()
+                response = self.authorized_client.get(url)
+                self.assertNotContains(response, 'EventSource')
+        response = self.authorized_client.get(reverse('posts:feed_events'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_follow_is_idempotent_and_cached(self):
+        """Повторная подписка не падает, кэш подписок сбрасывается."""
+        author = User.objects.create_user(username='Author')
+        profile_url = reverse('posts:profile', args=(author.username,))
+        follow_url = reverse('posts:profile_follow', args=(author.username,))
+        self.assertFalse(
+            self.authorized_client.get(profile_url).context['following'])
+        for _ in range(2):
+            self.authorized_client.get(follow_url)
+        self.assertEqual(
+            Follow.objects.filter(user=self.user, author=author).count(), 1)
+        self.assertTrue(
+            self.authorized_client.get(profile_url).context['following'])
+        self.assertEqual(
+            is_following(self.user, (author.pk, self.author.pk)),
+            {author.pk: True, self.author.pk: False},
+        )
+        Follow.objects.filter(user=self.user).delete()
+        self.assertFalse(
+            self.authorized_client.get(profile_url).context['following'])
+
+    def test_self_follow_is_ignored(self):
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=(self.user.username,)))
+        self.assertFalse(
+            Follow.objects.filter(user=self.user, author=self.user).exists())
+
+    def test_follow_bulk_and_export(self):
+        """Массовая подписка через API и потоковая выгрузка."""
+        for name in ('first', 'second'):
+            User.objects.create_user(username=name)
+        response = self.authorized_client.post(
+            reverse('posts:follow_bulk'),
+            json.dumps({
+                'follow': ['first', 'second', 'nobody', self.user.username],
+                'unfollow': ['AntonChekhov'],
+            }),
+            content_type='application/json',
+        )
+        self.assertEqual(response.json(), {'followed': 2, 'unfollowed': 1})
+        self.assertEqual(
+            set(self.user.follower.values_list(
+                'author__username', flat=True)),
+            {'first', 'second'},
+        )
+        # Повторная подписка не считается новой.
+        User.objects.create_user(username='third')
+        response = self.authorized_client.post(
+            reverse('posts:follow_bulk'),
+            '\n'.join([
+                '{"follow": "first"}', '{"follow": "third"}',
+                '{"unfollow": "second"}', '',
+            ]),
+            content_type='application/x-ndjson',
+        )
+        self.assertEqual(response.json(), {'followed': 1, 'unfollowed': 1})
+        self.assertEqual(
+            set(self.user.follower.values_list(
+                'author__username', flat=True)),
+            {'first', 'third'},
+        )
+        # Ошибочная строка: предыдущие уже применены, ответ об этом говорит.
+        response = self.authorized_client.post(
+            reverse('posts:follow_bulk'),
+            '{"unfollow": "third"}\nnot json\n{"follow": "second"}\n',
+            content_type='application/x-ndjson',
+        )
+        self.assertEqual(response.status_code, 400)
+        data = response.json()
+        self.assertEqual(
+            (data['followed'], data['unfollowed']), (0, 1))
+        self.assertIn('Строка 2', data['error'])
+        self.assertEqual(
+            list(self.user.follower.values_list(
+                'author__username', flat=True)), ['first'])
+        with self.settings(FOLLOW_BULK_MAX_SIZE=10):
+            response = self.authorized_client.post(
+                reverse('posts:follow_bulk'),
+                json.dumps({'follow': ['first', 'second']}),
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 413)
+        response = self.authorized_client.get(reverse('posts:follow_export'))
+        self.assertEqual(
+            set(b''.join(response.streaming_content).decode().split()),
+            {'first'},
+        )
+
+    def test_follow_import_export_commands(self):
+        """Команды импорта и выгрузки подписок."""
+        User.objects.create_user(username='reader')
+        with tempfile.NamedTemporaryFile(
+                'w', suffix='.jsonl', delete=False) as source:
+            source.write('{"user": "reader", "author": "StasBasov"}\n')
+            source.write('{"user": "reader", "author": "StasBasov"}\n')
+            source.write('{"user": "reader", "author": "AntonChekhov"}\n')
+        self.addCleanup(os.remove, source.name)
+        call_command('import_follows', source.name, stdout=StringIO())
+        self.assertEqual(
+            Follow.objects.filter(user__username='reader').count(), 2)
+        out = StringIO()
+        call_command('export_follows', stdout=out)
+        self.assertIn('reader,AntonChekhov', out.getvalue().splitlines())
+
+    def test_group_index_reads_only_stats(self):
+        """Каталог групп не сканирует посты."""
+        for number in range(3):
+            Post.objects.create(
+                author=self.author, text='Пост', group=self.group)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('posts:group_index'))
+        self.assertContains(response, 'Постов: 4')
+        self.assertContains(
+            response, reverse('posts:profile', args=(self.author.username,)))
+
+    def test_trending_page(self):
+        refresh_trending()
+        response = self.client.get(reverse('posts:trending'))
+        self.assertIn(self.post, response.context['page_obj'])
+
+    def test_archive_month_pages(self):
+        """Страницы архива по месяцам для сайта, группы и автора."""
+        pub_date = timezone.localtime(self.post.pub_date)
+        date_args = (pub_date.year, pub_date.month)
+        urls = (
+            reverse('posts:archive_month', args=date_args),
+            reverse('posts:group_archive_month',
+                    args=(self.group.slug, *date_args)),
+            reverse('posts:profile_archive_month',
+                    args=(self.author.username, *date_args)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn(self.post, response.context['page_obj'])
+        response = self.client.get(
+            reverse('posts:archive_month', args=(pub_date.year - 1, 1)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_feed_stamps_expire(self):
+        """Отметки обновления лент не вечные: их сбрасывает и срок."""
+        feed_cache = caches[settings.FEED_CACHE_ALIAS]
+        with mock.patch.object(
+                feed_cache, 'set', wraps=feed_cache.set) as cache_set, \
+                mock.patch.object(feed_cache, 'set_many',
+                                  wraps=feed_cache.set_many) as set_many:
+            feed_updated(SITE_SCOPE)
+            invalidate_feeds([SITE_SCOPE])
+        self.assertEqual(
+            cache_set.call_args_list[0][0][2], FEED_CACHE_TIMEOUT)
+        self.assertEqual(set_many.call_args[0][1], FEED_CACHE_TIMEOUT)
+
+    def test_atom_feeds(self):
+        """Atom-ленты: поток, кэш, If-Modified-Since и сброс кэша."""
+        # На повторный запрос остаётся только поиск группы или автора.
+        urls = {
+            reverse('posts:index_feed'): 0,
+            reverse('posts:group_feed', args=(self.group.slug,)): 1,
+            reverse('posts:profile_feed', args=(self.author.username,)): 1,
+        }
+        for url, queries in urls.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.streaming)
+                body = b''.join(response.streaming_content).decode()
+                self.assertIn(f'/posts/{self.post.pk}/', body)
+                with self.assertNumQueries(queries):
+                    cached = self.client.get(url)
+                self.assertEqual(cached.content.decode(), body)
+                not_modified = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(not_modified.status_code, 304)
+        new_post = Post.objects.create(
+            author=self.author, text='Свежий', group=self.group)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                body = b''.join(response.streaming_content).decode()
+                self.assertIn(f'/posts/{new_post.pk}/', body)
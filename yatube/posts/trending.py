@@ -0,0 +1,104 @@
+import math
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .models import Follow, Post, PostRank
+from .utils import EPOCH
+
+COMMENT_WEIGHT: float = 3.0
+FOLLOWER_WEIGHT: float = 1.0
+# За это время вес поста падает в e раз.
+DECAY_SECONDS: int = 12 * 60 * 60
+WINDOW: timedelta = timedelta(days=7)
+
+
+def post_score(pub_date, comments, followers):
+    """Рейтинг с затуханием по времени.
+
+    Затухание записано как прибавка за свежесть, а не как деление на
+    возраст: порядок постов без новой активности со временем не меняется,
+    и пересчитывать нужно только посты, где что-то произошло.
+    """
+    engagement = 1 + COMMENT_WEIGHT * comments + FOLLOWER_WEIGHT * math.log1p(
+        followers)
+    return math.log(engagement) + (
+        (pub_date - EPOCH).total_seconds() / DECAY_SECONDS)
+
+
+def changed_posts(since, window_start):
+    """Посты окна, у которых с момента since появилась активность."""
+    posts = Post.objects.filter(pub_date__gte=window_start)
+    if since is None:
+        return posts
+    authors = Follow.objects.filter(created__gte=since).values('author_id')
+    return posts.filter(
+        Q(pub_date__gte=since)
+        | Q(comments__created__gte=since)
+        | Q(author_id__in=authors)
+    ).distinct()
+
+
+def score_posts(post_ids, updated):
+    """Пересчитать рейтинг постов с pk из post_ids, отметив его updated."""
+    posts = list(
+        Post.objects.filter(pk__in=post_ids).order_by().annotate(
+            comments_count=Count('comments', distinct=True)
+        ).values('pk', 'pub_date', 'author_id', 'comments_count')
+    )
+    followers = dict(
+        Follow.objects.filter(
+            author_id__in={post['author_id'] for post in posts},
+        ).order_by().values('author_id').annotate(
+            count=Count('pk')).values_list('author_id', 'count')
+    )
+    PostRank.objects.filter(pk__in=[post['pk'] for post in posts]).delete()
+    PostRank.objects.bulk_create(
+        PostRank(
+            post_id=post['pk'],
+            score=post_score(
+                post['pub_date'],
+                post['comments_count'],
+                followers.get(post['author_id'], 0),
+            ),
+            updated=updated,
+        )
+        for post in posts
+    )
+    return len(posts)
+
+
+@transaction.atomic
+def refresh_trending(now=None):
+    """Пересчитать рейтинг постов с новой активностью.
+
+    Возвращает число пересчитанных постов.
+    """
+    now = now or timezone.now()
+    window_start = now - WINDOW
+    PostRank.objects.filter(post__pub_date__lt=window_start).delete()
+    # Отметка — начало прошлого пересчёта, так что активность во время
+    # него попадёт в следующий.
+    since = PostRank.objects.aggregate(last=Max('updated'))['last']
+    # Счётчик — отдельным запросом: в changed_posts соединение с
+    # комментариями отфильтровано по since, и Count посчитал бы только новые.
+    return score_posts(changed_posts(since, window_start).values('pk'), now)
+
+
+@transaction.atomic
+def rescore_author(author_id):
+    """Пересчитать рейтинг постов автора, например после отписки.
+
+    Отписку не видно по таблицам, поэтому её не найдёт changed_posts.
+    Отметка пересчёта не сдвигается: иначе следующий refresh_trending
+    пропустил бы активность, накопившуюся до неё.
+    """
+    since = PostRank.objects.aggregate(last=Max('updated'))['last']
+    if since is None:
+        return 0
+    return score_posts(
+        PostRank.objects.filter(post__author_id=author_id).values('post_id'),
+        since,
+    )
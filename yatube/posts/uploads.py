@@ -0,0 +1,185 @@
+import os
+import re
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Upload
+
+ALLOWED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+# Сигнатура и смещение: по первым байтам видно, что это картинка.
+IMAGE_SIGNATURES = (
+    (0, b'\xff\xd8\xff'),
+    (0, b'\x89PNG\r\n\x1a\n'),
+    (0, b'GIF87a'),
+    (0, b'GIF89a'),
+    (8, b'WEBP'),
+)
+SIGNATURE_SIZE: int = 12
+READ_BLOCK: int = 64 * 1024
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(Exception):
+    """Отказ в приёме части; status — код HTTP-ответа."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class AssembledUpload(UploadedFile):
+    """Собранный файл загрузки для PostForm.
+
+    temporary_file_path позволяет ImageField проверить картинку с диска,
+    а хранилищу — переместить файл, а не копировать его.
+    """
+
+    def __init__(self, upload):
+        super().__init__(
+            open(upload.path, 'rb'), upload.filename, size=upload.size)
+        self.upload = upload
+
+    def temporary_file_path(self):
+        return self.upload.path
+
+
+def is_image(head):
+    return any(
+        head[offset:offset + len(signature)] == signature
+        for offset, signature in IMAGE_SIGNATURES
+    )
+
+
+def parse_content_range(header):
+    """'bytes 0-1023/5000' → (0, 1023, 5000)."""
+    match = CONTENT_RANGE_RE.match(header or '')
+    if match is None:
+        raise UploadError(400, 'Нужен заголовок Content-Range')
+    start, end, total = map(int, match.groups())
+    if start > end:
+        raise UploadError(400, 'Неверный Content-Range')
+    return start, end, total
+
+
+def start_upload(user, filename, size):
+    filename = os.path.basename(str(filename))
+    if not filename.lower().endswith(ALLOWED_EXTENSIONS):
+        raise UploadError(415, 'Можно загружать только картинки')
+    if not 0 < size <= settings.UPLOAD_MAX_SIZE:
+        raise UploadError(413, 'Слишком большой файл')
+    upload = Upload.objects.create(user=user, filename=filename, size=size)
+    os.makedirs(settings.UPLOAD_TEMP_DIR, exist_ok=True)
+    open(upload.path, 'wb').close()
+    return upload
+
+
+def check_chunk(upload, start, end, total):
+    if total != upload.size or end >= upload.size:
+        raise UploadError(400, 'Размер не совпадает с заявленным')
+    if start != upload.received:
+        raise UploadError(409, 'Ожидается другое смещение')
+
+
+def write_chunk(upload_id, user, content_range, stream):
+    """Дописать часть файла; вернуть Upload с новым смещением.
+
+    Часть принимается только с текущего смещения, поэтому повтор после
+    обрыва начинается с того, что уже дошло, а дубль получает 409.
+    Тело сначала читается во временный файл: медленный клиент не держит
+    блокировку строки, под ней только сверка смещения и копия с диска.
+    """
+    start, end, total = parse_content_range(content_range)
+    length = end - start + 1
+    if length > settings.UPLOAD_CHUNK_SIZE:
+        raise UploadError(413, 'Слишком большая часть')
+    check_chunk(Upload.objects.get(pk=upload_id, user=user), start, end, total)
+    with tempfile.TemporaryFile(dir=settings.UPLOAD_TEMP_DIR) as chunk:
+        written = 0
+        while written < length:
+            block = stream.read(min(READ_BLOCK, length - written))
+            if not block:
+                break
+            if start == 0 and written == 0 and not is_image(
+                    block[:SIGNATURE_SIZE]):
+                raise UploadError(415, 'Файл не похож на картинку')
+            chunk.write(block)
+            written += len(block)
+        chunk.seek(0)
+        with transaction.atomic():
+            upload = Upload.objects.select_for_update().get(
+                pk=upload_id, user=user)
+            # Пока читали тело, ту же часть мог дописать повтор.
+            check_chunk(upload, start, end, total)
+            with open(upload.path, 'r+b') as file:
+                file.seek(start)
+                shutil.copyfileobj(chunk, file, READ_BLOCK)
+                file.truncate()
+            upload.received = start + written
+            upload.save(update_fields=('received',))
+    return upload
+
+
+def find_upload(request):
+    upload_id = request.POST.get('upload')
+    if request.FILES or not upload_id:
+        return request.FILES or None
+    try:
+        upload = Upload.objects.filter(
+            pk=upload_id, user=request.user).first()
+    except ValidationError:
+        return None
+    if upload is None or not upload.complete:
+        return None
+    return {'image': AssembledUpload(upload)}
+
+
+@contextmanager
+def upload_files(request):
+    """request.FILES или собранная загрузка из поля upload формы поста.
+
+    Файл собранной загрузки закрывается при выходе из блока, в том числе
+    когда форма не прошла проверку.
+    """
+    files = find_upload(request)
+    try:
+        yield files
+    finally:
+        image = (files or {}).get('image')
+        if isinstance(image, AssembledUpload):
+            image.close()
+
+
+def finish_upload(files):
+    """Удалить загрузку после того, как картинка попала в пост."""
+    image = (files or {}).get('image')
+    if isinstance(image, AssembledUpload):
+        image.close()
+        discard(image.upload)
+
+
+def discard(upload):
+    try:
+        os.remove(upload.path)
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def purge_stale(now=None):
+    """Удалить брошенные загрузки старше UPLOAD_EXPIRE."""
+    now = now or timezone.now()
+    stale = Upload.objects.filter(
+        created__lt=now - timedelta(seconds=settings.UPLOAD_EXPIRE))
+    count = 0
+    for upload in stale.iterator():
+        discard(upload)
+        count += 1
+    return count
@@ -6,9 +6,60 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('fragment/', views.index_fragment, name='index_fragment'),
+    path('trending/', views.trending, name='trending'),
+    path('atom/', views.index_feed, name='index_feed'),
+    path('archive/', views.archive, name='archive'),
+    path(
+        'archive/<int:year>/<int:month>/',
+        views.archive,
+        name='archive_month'
+    ),
+    path('group/', views.group_index, name='group_index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path(
+        'group/<slug:slug>/fragment/',
+        views.group_fragment,
+        name='group_fragment'
+    ),
+    path('group/<slug:slug>/atom/', views.group_feed, name='group_feed'),
+    path(
+        'group/<slug:slug>/archive/',
+        views.group_archive,
+        name='group_archive'
+    ),
+    path(
+        'group/<slug:slug>/archive/<int:year>/<int:month>/',
+        views.group_archive,
+        name='group_archive_month'
+    ),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/fragment/',
+        views.profile_fragment,
+        name='profile_fragment'
+    ),
+    path(
+        'profile/<str:username>/atom/',
+        views.profile_feed,
+        name='profile_feed'
+    ),
+    path(
+        'profile/<str:username>/archive/',
+        views.profile_archive,
+        name='profile_archive'
+    ),
+    path(
+        'profile/<str:username>/archive/<int:year>/<int:month>/',
+        views.profile_archive,
+        name='profile_archive_month'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/events/',
+        views.post_events,
+        name='post_events'
+    ),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
@@ -16,7 +67,19 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path('events/', views.feed_events, name='feed_events'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/fragment/', views.follow_fragment, name='follow_fragment'),
+    path('follow/events/', views.follow_events, name='follow_events'),
+    path('follow/bulk/', views.follow_bulk, name='follow_bulk'),
+    path('follow/export/', views.follow_export, name='follow_export'),
+    path('notifications/', views.notifications, name='notifications'),
+    path('upload/', views.upload_start, name='upload_start'),
+    path(
+        'upload/<uuid:upload_id>/',
+        views.upload_chunk,
+        name='upload_chunk'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
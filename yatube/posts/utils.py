@@ -1,10 +1,108 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.db.models import Q
 
 NUM_OF_POSTS: int = 10
+MAX_NUM_OF_POSTS: int = 50
+NEXT_PAGE_CACHE_TIMEOUT: int = 60
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def page_size(request, feed):
+    """Размер страницы ленты с учётом ?limit=, ограниченного сверху."""
+    size = getattr(settings, 'POSTS_PER_PAGE', {}).get(feed, NUM_OF_POSTS)
+    limit = request.GET.get('limit', '')
+    if limit.isdigit() and int(limit) > 0:
+        max_size = getattr(settings, 'POSTS_MAX_PER_PAGE', MAX_NUM_OF_POSTS)
+        size = min(int(limit), max_size)
+    return size
+
+
+class PrefetchPaginator(Paginator):
+    """Паджинатор, который вместе со страницей N выбирает и страницу N+1.
+
+    Строки следующей страницы кладутся в кэш целиком: её запрос не
+    ходит в БД, а содержимое выбрано тем же запросом, что и страница N,
+    так что новые публикации не дублируют и не пропускают посты на стыке.
+    """
+
+    def __init__(self, object_list, per_page, cache_key, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+
+    def page_cache_key(self, number):
+        return f'{self.cache_key}:{self.per_page}:{number}'
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        objects = cache.get(self.page_cache_key(number))
+        if objects is not None:
+            return self._get_page(objects, number, self)
+        rows = list(self.object_list[bottom:top + self.per_page])
+        if rows[self.per_page:]:
+            cache.set(
+                self.page_cache_key(number + 1),
+                rows[self.per_page:],
+                NEXT_PAGE_CACHE_TIMEOUT,
+            )
+        return self._get_page(rows[:self.per_page], number, self)
 
 
-def paginate(request, post_list):
+def feed_cache_key(request, feed):
+    """Ключ ленты: путь, пользователь и параметры запроса, кроме page."""
+    query = request.GET.copy()
+    query.pop('page', None)
+    digest = hashlib.md5(
+        query.urlencode().encode()).hexdigest() if query else ''
+    user_id = request.user.pk if request.user.is_authenticated else 0
+    return f'feed:{feed}:{request.path}:{user_id}:{digest}'
+
+
+def paginate(request, post_list, feed='index'):
     """Страницы."""
-    paginator = Paginator(post_list, NUM_OF_POSTS)
+    per_page = page_size(request, feed)
+    if getattr(settings, 'POSTS_PREFETCH_NEXT_PAGE', False):
+        paginator = PrefetchPaginator(
+            post_list, per_page, feed_cache_key(request, feed))
+    else:
+        paginator = Paginator(post_list, per_page)
+    paginator.limit_query = (
+        f'&limit={per_page}' if 'limit' in request.GET else '')
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
+
+
+def make_cursor(post):
+    """Курсор ленты: время публикации в микросекундах и id поста."""
+    micros = (post.pub_date - EPOCH) // timedelta(microseconds=1)
+    return f'{micros}-{post.pk}'
+
+
+def after_cursor(post_list, cursor):
+    """Посты ленты, идущие после курсора, в порядке (-pub_date, -pk)."""
+    post_list = post_list.order_by('-pub_date', '-pk')
+    try:
+        micros, pk = (int(part) for part in cursor.split('-'))
+    except (AttributeError, ValueError):
+        return post_list
+    pub_date = EPOCH + timedelta(microseconds=micros)
+    return post_list.filter(
+        Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk))
+
+
+def newer_than(post_list, cursor):
+    """Посты новее курсора, от старых к новым."""
+    post_list = post_list.order_by('pub_date', 'pk')
+    try:
+        micros, pk = (int(part) for part in cursor.split('-'))
+    except (AttributeError, ValueError):
+        return post_list.none()
+    pub_date = EPOCH + timedelta(microseconds=micros)
+    return post_list.filter(
+        Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk))
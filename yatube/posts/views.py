@@ -1,27 +1,71 @@
+import json
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, JsonResponse,
+    StreamingHttpResponse
+)
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.cache import cache_page
-from .models import Post, Group, User, Follow
+from django.views.decorators.http import require_http_methods, require_POST
+from core.pubsub import event_stream_response
+from .models import ArchiveMonth, Notification, Post, Group, Upload, User
+from .tasks import warm_thumbnail
+from .archive import SITE_SCOPE, author_scope, group_scope, month_posts
+from .feeds import atom_response
+from .follows import (
+    bulk_follow, bulk_unfollow, export_follows, follow, following_ids,
+    is_following, unfollow
+)
 from .forms import PostForm, CommentForm
-from .utils import paginate
+from .live import POSTS_CHANNEL, post_channel
+from .notifications import mark_read
+from .templatetags.posts_tags import render_post_cards
+from .uploads import (
+    UploadError, finish_upload, start_upload, upload_files, write_chunk
+)
+from .utils import (
+    after_cursor, make_cursor, newer_than, page_size, paginate
+)
 
 
 @cache_page(20, key_prefix='index_page')
 def index(request):
     """Функция вызова главной страницы."""
-    post_list = Post.objects.all()
-    page_obj = paginate(request, post_list)
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = paginate(request, post_list, 'index')
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+def trending(request):
+    """Популярные посты по заранее посчитанному рейтингу."""
+    post_list = Post.objects.filter(rank__isnull=False).select_related(
+        'author', 'group').order_by('-rank__score')
+    page_obj = paginate(request, post_list, 'trending')
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+def group_index(request):
+    """Каталог групп с накопленной статистикой."""
+    groups = Group.objects.select_related('stats').order_by('title')
+    return render(request, 'posts/group_index.html', {'groups': groups})
+
+
 def group_posts(request, slug):
     """Функция вызова страницы с постами групп."""
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = paginate(request, post_list)
+    post_list = group.posts.select_related('author', 'group')
+    page_obj = paginate(request, post_list, 'group_list')
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -32,11 +76,9 @@ def group_posts(request, slug):
 def profile(request, username):
     """Функция вызова профиля пользователя."""
     author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    page_obj = paginate(request, post_list)
-    following = request.user.is_authenticated
-    if following:
-        following = request.user.follower.filter(author=author).exists()
+    post_list = author.posts.select_related('author', 'group')
+    page_obj = paginate(request, post_list, 'profile')
+    following = is_following(request.user, (author.pk,))[author.pk]
     context = {
         'author': author,
         'page_obj': page_obj,
@@ -45,6 +87,145 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+def feed_fragment(request, post_list, feed, show_group=True):
+    """Порция карточек ленты и курсор следующей порции.
+
+    С ?since=<курсор> — посты новее курсора (для живых обновлений)
+    и курсор самого нового из них.
+    """
+    size = page_size(request, feed)
+    since = request.GET.get('since')
+    if since is not None:
+        posts = list(newer_than(
+            post_list.select_related('author', 'group'), since)[:size])
+        posts.reverse()
+        return JsonResponse({
+            'html': render_post_cards(posts, show_group),
+            'latest': make_cursor(posts[0]) if posts else since,
+        })
+    post_list = after_cursor(
+        post_list.select_related('author', 'group'),
+        request.GET.get('cursor'),
+    )
+    posts = list(post_list[:size + 1])
+    next_cursor = make_cursor(posts[size - 1]) if len(posts) > size else None
+    return JsonResponse({
+        'html': render_post_cards(posts[:size], show_group),
+        'next': next_cursor,
+    })
+
+
+def index_fragment(request):
+    """Подгрузка главной ленты."""
+    return feed_fragment(request, Post.objects.all(), 'index')
+
+
+@login_required
+def follow_fragment(request):
+    """Подгрузка ленты избранных авторов."""
+    return feed_fragment(
+        request,
+        Post.objects.filter(author_id__in=following_ids(request.user)),
+        'follow_index',
+    )
+
+
+def group_fragment(request, slug):
+    """Подгрузка ленты группы."""
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return feed_fragment(
+        request,
+        Post.objects.filter(group=group),
+        'group_list',
+        show_group=False,
+    )
+
+
+def profile_fragment(request, username):
+    """Подгрузка ленты автора."""
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return feed_fragment(
+        request, Post.objects.filter(author=author), 'profile')
+
+
+def archive_page(request, scope, title, archive_url, year=None, month=None):
+    """Архив раздела: список месяцев и посты выбранного месяца."""
+    months = ArchiveMonth.objects.filter(scope=scope)
+    context = {
+        'title': title,
+        'months': months,
+        'archive_url': archive_url,
+    }
+    if year is not None:
+        archive_month = get_object_or_404(
+            months, month__year=year, month__month=month)
+        post_list = month_posts(scope, archive_month).select_related(
+            'author', 'group')
+        context['archive_month'] = archive_month
+        context['page_obj'] = paginate(request, post_list, 'archive')
+    return render(request, 'posts/archive.html', context)
+
+
+def archive(request, year=None, month=None):
+    """Архив сайта по месяцам."""
+    return archive_page(
+        request, SITE_SCOPE, 'Архив', reverse('posts:archive'), year, month)
+
+
+def group_archive(request, slug, year=None, month=None):
+    """Архив группы по месяцам."""
+    group = get_object_or_404(Group, slug=slug)
+    return archive_page(
+        request,
+        group_scope(group.pk),
+        f'Архив сообщества {group.title}',
+        reverse('posts:group_archive', args=(slug,)),
+        year,
+        month,
+    )
+
+
+def profile_archive(request, username, year=None, month=None):
+    """Архив автора по месяцам."""
+    author = get_object_or_404(User, username=username)
+    return archive_page(
+        request,
+        author_scope(author.pk),
+        f'Архив пользователя {author.get_full_name() or author.username}',
+        reverse('posts:profile_archive', args=(username,)),
+        year,
+        month,
+    )
+
+
+def index_feed(request):
+    """Atom-лента сайта."""
+    return atom_response(
+        request, SITE_SCOPE, 'Yatube', reverse('posts:index'))
+
+
+def group_feed(request, slug):
+    """Atom-лента группы."""
+    group = get_object_or_404(Group, slug=slug)
+    return atom_response(
+        request,
+        group_scope(group.pk),
+        f'Yatube: {group.title}',
+        reverse('posts:group_list', args=(slug,)),
+    )
+
+
+def profile_feed(request, username):
+    """Atom-лента автора."""
+    author = get_object_or_404(User, username=username)
+    return atom_response(
+        request,
+        author_scope(author.pk),
+        f'Yatube: {author.get_full_name() or author.username}',
+        reverse('posts:profile', args=(username,)),
+    )
+
+
 def post_detail(request, post_id):
     """Отображение информации об определенном посте."""
     post = get_object_or_404(Post, pk=post_id)
@@ -61,15 +242,19 @@ def post_detail(request, post_id):
 @login_required
 def post_create(request):
     """Создание поста."""
-    form = PostForm(
-        request.POST or None,
-        files=request.FILES or None,
-    )
-    if request.method == 'POST' and form.is_valid():
-        post = form.save(commit=False)
-        post.author = request.user
-        post.save()
-        return redirect('posts:profile', request.user.username)
+    with upload_files(request) as files:
+        form = PostForm(
+            request.POST or None,
+            files=files,
+        )
+        if request.method == 'POST' and form.is_valid():
+            post = form.save(commit=False)
+            post.author = request.user
+            post.save()
+            finish_upload(files)
+            if post.image:
+                warm_thumbnail.delay(post.pk)
+            return redirect('posts:profile', request.user.username)
     return render(request, 'posts/post_create.html', {'form': form})
 
 
@@ -79,19 +264,23 @@ def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if post.author != request.user:
         return redirect('posts:post_detail', post_id=post_id)
-    form = PostForm(
-        request.POST or None,
-        files=request.FILES or None,
-        instance=post,
-    )
+    with upload_files(request) as files:
+        form = PostForm(
+            request.POST or None,
+            files=files,
+            instance=post,
+        )
+        if form.is_valid():
+            post = form.save()
+            finish_upload(files)
+            if 'image' in form.changed_data and post.image:
+                warm_thumbnail.delay(post.pk)
+            return redirect('posts:post_detail', post_id=post_id)
     context = {
         'post': post,
         'form': form,
         'is_edit': True,
     }
-    if form.is_valid():
-        post = form.save()
-        return redirect('posts:post_detail', post_id=post_id)
     return render(request, 'posts/post_create.html', context)
 
 
@@ -112,24 +301,36 @@ def add_comment(request, post_id):
 def follow_index(request):
     """Посты избранных авторов."""
     post_list = Post.objects.filter(
-        author__following__user=request.user.id).all()
-    page_obj = paginate(request, post_list)
+        author_id__in=following_ids(request.user)
+    ).select_related('author', 'group')
+    page_obj = paginate(
+        request, post_list, 'follow_index')
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/follow.html', context)
 
 
+@login_required
+def notifications(request):
+    """Уведомления пользователя; показанные отмечаются прочитанными."""
+    notification_list = Notification.objects.filter(
+        user=request.user).select_related('actor', 'post', 'comment')
+    page_obj = paginate(request, notification_list, 'notifications')
+    # Страница уже выбрана, поэтому на ней видно, что было непрочитанным.
+    # Остальные страницы и пришедшие за это время уведомления не трогаем.
+    mark_read(request.user, [
+        notification.pk for notification in page_obj if not notification.read
+    ])
+    return render(
+        request, 'posts/notifications.html', {'page_obj': page_obj})
+
+
 @login_required
 def profile_follow(request, username):
     """Подписка."""
     author = get_object_or_404(User, username=username)
-    follow = Follow.objects.filter(user=request.user, author=author)
-    if author == request.user or follow.exists():
-        return redirect(
-            'posts:profile', username=username
-        )
-    Follow.objects.create(user=request.user, author=author)
+    follow(request.user, author)
     return redirect(
         'posts:profile', username=username
     )
@@ -139,5 +340,149 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     """Отписка."""
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    unfollow(request.user, author)
     return redirect('posts:profile', username=username)
+
+
+def bulk_actions(lines, errors):
+    """Поток (действие, username) из строк JSONL вида {"follow": "name"}.
+
+    На первой ошибочной строке поток заканчивается, описание ошибки
+    добавляется в errors.
+    """
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            (action, name), = json.loads(line).items()
+            if action not in ('follow', 'unfollow'):
+                raise ValueError(action)
+        except (ValueError, AttributeError, TypeError):
+            errors.append(f'Строка {number}: ожидается {{"follow": ...}} '
+                          'или {"unfollow": ...}')
+            return
+        yield action, str(name)
+
+
+@login_required
+@require_POST
+def follow_bulk(request):
+    """Массовая подписка и отписка.
+
+    JSON {"follow": [...], "unfollow": [...]} не больше FOLLOW_BULK_MAX_SIZE;
+    большие списки передаются как application/x-ndjson и читаются потоком,
+    по строке {"follow": "name"} или {"unfollow": "name"}. Строки до
+    ошибочной уже применены: ответ 400 сообщает, сколько их было.
+    """
+    username = request.user.username
+    counts = {'followed': 0, 'unfollowed': 0}
+    if request.content_type == 'application/x-ndjson':
+        errors = []
+        for action, group in groupby(
+                bulk_actions(request, errors), key=itemgetter(0)):
+            pairs = ((username, name) for _, name in group)
+            if action == 'follow':
+                counts['followed'] += bulk_follow(pairs)
+            else:
+                counts['unfollowed'] += bulk_unfollow(pairs)
+        if errors:
+            return JsonResponse({**counts, 'error': errors[0]}, status=400)
+        return JsonResponse(counts)
+    if int(request.META.get('CONTENT_LENGTH') or 0) > (
+            settings.FOLLOW_BULK_MAX_SIZE):
+        return HttpResponse(status=413)
+    try:
+        data = json.loads(request.body)
+        to_follow = [str(name) for name in data.get('follow', ())]
+        to_unfollow = [str(name) for name in data.get('unfollow', ())]
+    except (ValueError, AttributeError, TypeError):
+        return HttpResponseBadRequest()
+    counts['followed'] = bulk_follow((username, name) for name in to_follow)
+    counts['unfollowed'] = bulk_unfollow(
+        (username, name) for name in to_unfollow)
+    return JsonResponse(counts)
+
+
+@login_required
+def follow_export(request):
+    """Потоковая выгрузка своих подписок в CSV."""
+    rows = (f'{author}\n' for _, author in export_follows(request.user))
+    response = StreamingHttpResponse(rows, content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="follows.csv"'
+    return response
+
+
+def upload_state(upload, status=200, error=None):
+    data = {
+        'id': str(upload.pk),
+        'offset': upload.received,
+        'size': upload.size,
+        'chunk_size': settings.UPLOAD_CHUNK_SIZE,
+    }
+    if error is not None:
+        data['error'] = str(error)
+    return JsonResponse(data, status=status)
+
+
+@login_required
+@require_POST
+def upload_start(request):
+    """Начать загрузку картинки по частям: {"filename": ..., "size": ...}.
+
+    Части отправляются PUT на upload/<id>/ с Content-Range; GET там же
+    сообщает, сколько уже получено. Готовую загрузку форма поста
+    принимает в поле upload вместо файла image.
+    """
+    try:
+        data = json.loads(request.body)
+        upload = start_upload(
+            request.user, data['filename'], int(data['size']))
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest()
+    except UploadError as error:
+        return JsonResponse({'error': str(error)}, status=error.status)
+    return upload_state(upload, status=201)
+
+
+@login_required
+@require_http_methods(['GET', 'HEAD', 'PUT'])
+def upload_chunk(request, upload_id):
+    """Состояние загрузки или приём очередной части."""
+    if request.method != 'PUT':
+        return upload_state(get_object_or_404(
+            Upload, pk=upload_id, user=request.user))
+    try:
+        upload = write_chunk(
+            upload_id, request.user, request.META.get('HTTP_CONTENT_RANGE'),
+            request)
+    except Upload.DoesNotExist:
+        raise Http404
+    except UploadError as error:
+        upload = get_object_or_404(Upload, pk=upload_id, user=request.user)
+        return upload_state(upload, error.status, error)
+    return upload_state(upload)
+
+
+def feed_events(request):
+    """SSE-поток о новых постах для главной ленты."""
+    return event_stream_response(request, POSTS_CHANNEL, 'post')
+
+
+@login_required
+def follow_events(request):
+    """SSE-поток о новых постах избранных авторов.
+
+    Подписки берутся на время соединения: фильтр выполняется в цикле
+    событий ASGI, где в БД ходить нельзя.
+    """
+    authors = following_ids(request.user)
+    return event_stream_response(
+        request, POSTS_CHANNEL, 'post',
+        accept=lambda message: message['author'] in authors,
+    )
+
+
+def post_events(request, post_id):
+    """SSE-поток о новых комментариях к посту."""
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return event_stream_response(request, post_channel(post_id), 'comment')
@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Task
+from .registry import registry
+
+STALE_AFTER: timedelta = timedelta(minutes=10)
+
+
+def claim(limit):
+    """Забрать до limit готовых задач.
+
+    Задача считается взятой, только если условный UPDATE изменил строку,
+    поэтому несколько воркеров не получат одну задачу.
+    """
+    now = timezone.now()
+    candidates = Task.objects.filter(
+        status=Task.QUEUED, run_at__lte=now,
+    ).values_list('pk', flat=True)[:limit]
+    claimed = [
+        pk for pk in candidates
+        if Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+            status=Task.RUNNING, locked_at=now)
+    ]
+    return list(Task.objects.filter(pk__in=claimed))
+
+
+def complete(task):
+    Task.objects.filter(pk=task.pk).update(
+        status=Task.DONE, attempts=task.attempts + 1, last_error='')
+
+
+def fail(task, error):
+    """Вернуть задачу в очередь с задержкой или отправить в мёртвые."""
+    attempts = task.attempts + 1
+    if task.name in registry and attempts <= task.max_retries:
+        Task.objects.filter(pk=task.pk).update(
+            status=Task.QUEUED,
+            attempts=attempts,
+            run_at=registry[task.name].retry_at(attempts),
+            locked_at=None,
+            last_error=error,
+        )
+        return
+    Task.objects.filter(pk=task.pk).update(
+        status=Task.DEAD, attempts=attempts, last_error=error)
+
+
+def requeue_stale(stale_after=STALE_AFTER):
+    """Вернуть в очередь задачи, брошенные упавшим воркером."""
+    return Task.objects.filter(
+        status=Task.RUNNING,
+        locked_at__lt=timezone.now() - stale_after,
+    ).update(status=Task.QUEUED, locked_at=None)
+
+
+def requeue_dead():
+    """Повторить все задачи из мёртвых с нуля."""
+    return Task.objects.filter(status=Task.DEAD).update(
+        status=Task.QUEUED, attempts=0, run_at=timezone.now(),
+        locked_at=None)
+
+
+def purge_done(older_than):
+    return Task.objects.filter(
+        status=Task.DONE, run_at__lt=timezone.now() - older_than,
+    ).delete()[0]
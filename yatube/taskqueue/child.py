@@ -0,0 +1,28 @@
+"""Код дочерних процессов воркера.
+
+Модуль импортируется до django.setup(), поэтому модели и реестр задач
+подключаются только внутри функций.
+"""
+import traceback
+
+import django
+
+
+def init_process():
+    """Дочерний процесс настраивает Django и открывает свои соединения."""
+    django.setup()
+
+
+def run_in_process(name, payload):
+    """Выполнение задачи; ошибка возвращается текстом."""
+    from django.db import connections
+
+    from .registry import execute
+
+    try:
+        execute(name, payload)
+    except Exception:
+        return traceback.format_exc()
+    finally:
+        connections.close_all()
+    return None
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from taskqueue import broker
+from taskqueue.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Воркер очереди задач.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument('--poll', type=float, default=1.0)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить всё готовое и выйти.')
+        parser.add_argument(
+            '--requeue-dead', action='store_true',
+            help='Вернуть мёртвые задачи в очередь и выйти.')
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            count = broker.requeue_dead()
+            self.stdout.write(f'Возвращено в очередь: {count}')
+            return
+        Worker(options['processes'], options['poll']).run(options['once'])
@@ -0,0 +1,44 @@
+from django.db import models
+
+
+class Task(models.Model):
+    """Задача в очереди."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    DEAD = 'dead'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (DEAD, 'Не выполнена'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    payload = models.TextField('Аргументы', help_text='JSON: [args, kwargs]')
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+    )
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    max_retries = models.PositiveIntegerField('Повторов', default=3)
+    run_at = models.DateTimeField('Запустить после')
+    locked_at = models.DateTimeField('Взята в работу', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Дата создания', auto_now_add=True)
+
+    class Meta:
+        ordering = ('run_at', 'pk')
+        indexes = [
+            models.Index(
+                fields=['status', 'run_at'], name='task_status_run_at_idx'
+            )
+        ]
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
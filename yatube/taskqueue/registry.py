@@ -0,0 +1,64 @@
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Task
+
+DEFAULT_MAX_RETRIES: int = 3
+DEFAULT_RETRY_DELAY: int = 10
+
+registry = {}
+
+
+class TaskFunction:
+    """Функция, зарегистрированная как задача очереди."""
+
+    def __init__(self, func, name, max_retries, retry_delay):
+        self.func = func
+        self.name = name
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """Поставить задачу в очередь (или выполнить сразу в eager-режиме)."""
+        if getattr(settings, 'TASKS_ALWAYS_EAGER', False):
+            self.func(*args, **kwargs)
+            return None
+        return enqueue(self.name, *args, **kwargs)
+
+    def retry_at(self, attempts):
+        """Экспоненциальная задержка перед очередной попыткой."""
+        return timezone.now() + timedelta(
+            seconds=self.retry_delay * 2 ** (attempts - 1))
+
+
+def task(func=None, *, name=None, max_retries=DEFAULT_MAX_RETRIES,
+         retry_delay=DEFAULT_RETRY_DELAY):
+    """Декоратор регистрации задачи."""
+    def register(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        registry[task_name] = TaskFunction(
+            func, task_name, max_retries, retry_delay)
+        return registry[task_name]
+    return register(func) if func is not None else register
+
+
+def enqueue(name, *args, run_at=None, **kwargs):
+    """Записать задачу в очередь; аргументы должны сериализоваться в JSON."""
+    return Task.objects.create(
+        name=name,
+        payload=json.dumps([args, kwargs]),
+        max_retries=registry[name].max_retries,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def execute(name, payload):
+    """Выполнить задачу по имени; вызывается и в дочерних процессах."""
+    args, kwargs = json.loads(payload)
+    registry[name](*args, **kwargs)
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import TestCase, override_settings
+
+from .models import Task
+from .registry import task
+from .worker import Worker
+
+calls = []
+
+
+@task(max_retries=1, retry_delay=0)
+def remember(value):
+    calls.append(value)
+
+
+@task(max_retries=1, retry_delay=0)
+def explode():
+    raise ValueError('boom')
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = Worker(processes=2)
+
+    def run_worker(self):
+        with ThreadPoolExecutor(2) as pool:
+            return self.worker.run_batch(pool)
+
+    def test_task_runs_once(self):
+        remember.delay('first')
+        remember.delay('second')
+        self.assertEqual(self.run_worker(), 2)
+        self.assertEqual(self.run_worker(), 0)
+        self.assertCountEqual(calls, ['first', 'second'])
+        self.assertEqual(
+            Task.objects.filter(status=Task.DONE).count(), 2)
+
+    def test_failed_task_retries_then_dies(self):
+        explode.delay()
+        self.run_worker()
+        failed = Task.objects.get()
+        self.assertEqual(
+            (failed.status, failed.attempts), (Task.QUEUED, 1))
+        self.assertIn('boom', failed.last_error)
+        self.run_worker()
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), (Task.DEAD, 2))
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_eager_mode(self):
+        remember.delay('eager')
+        self.assertEqual(calls, ['eager'])
+        self.assertFalse(Task.objects.exists())
@@ -0,0 +1,74 @@
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.db import connections
+
+from . import broker
+from .child import init_process, run_in_process
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """Забирает задачи из БД и выполняет их в пуле процессов.
+
+    Все записи в таблицу задач делает родительский процесс, дочерние
+    только выполняют функции.
+    """
+
+    def __init__(self, processes=2, poll_interval=1.0):
+        self.processes = processes
+        self.poll_interval = poll_interval
+
+    def run_batch(self, pool):
+        """Один проход: забрать задачи, выполнить, записать итог."""
+        tasks = broker.claim(self.processes * 2)
+        futures = {
+            pool.submit(run_in_process, task.name, task.payload): task
+            for task in tasks
+        }
+        wait(futures)
+        broken = False
+        for future, task in futures.items():
+            exception = future.exception()
+            broken = broken or isinstance(exception, BrokenProcessPool)
+            error = future.result() if exception is None else repr(exception)
+            if error is None:
+                broker.complete(task)
+            else:
+                logger.warning('Задача %s упала: %s', task, error)
+                broker.fail(task, error)
+        if broken:
+            raise BrokenProcessPool('Дочерний процесс завершился аварийно')
+        return len(tasks)
+
+    def make_pool(self):
+        # Соединения родителя не должны достаться дочерним процессам.
+        connections.close_all()
+        return ProcessPoolExecutor(
+            self.processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_process,
+        )
+
+    def run(self, once=False):
+        broker.requeue_stale()
+        pool = self.make_pool()
+        try:
+            while True:
+                try:
+                    done = self.run_batch(pool)
+                except BrokenProcessPool:
+                    logger.error('Пул процессов упал, пересоздаём')
+                    pool.shutdown(wait=False)
+                    pool = self.make_pool()
+                    continue
+                if once and not done:
+                    return
+                if not done:
+                    time.sleep(self.poll_interval)
+        finally:
+            pool.shutdown()
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+USER_CACHE_TIMEOUT: int = 5 * 60
+
+
+def user_cache():
+    return caches[settings.USER_CACHE_ALIAS]
+
+
+def user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def perms_cache_key(user_id):
+    return f'auth-perms:{user_id}'
+
+
+def invalidate_user(user_id):
+    user_cache().delete_many(
+        [user_cache_key(user_id), perms_cache_key(user_id)])
+
+
+def invalidate_perms(user_ids):
+    user_cache().delete_many(
+        [perms_cache_key(user_id) for user_id in user_ids])
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который берёт пользователя и его права из кэша.
+
+    Подлинность сессии по-прежнему проверяет django.contrib.auth.get_user,
+    сравнивая хеш из сессии с хешем пароля закэшированного пользователя,
+    а любое сохранение пользователя сбрасывает кэш (users.signals).
+    Сброс виден всем процессам, только если USER_CACHE_ALIAS общий:
+    в кэше процесса после смены пароля остался бы старый хеш, и сессия
+    жила бы там до USER_CACHE_TIMEOUT (проверка users.E001).
+    """
+
+    def get_user(self, user_id):
+        cache = user_cache()
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        cache = user_cache()
+        key = perms_cache_key(user_obj.pk)
+        perms = cache.get(key)
+        if perms is None:
+            perms = super().get_all_permissions(user_obj)
+            cache.set(key, perms, USER_CACHE_TIMEOUT)
+        return perms
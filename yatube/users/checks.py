@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Бэкенды, у которых каждый процесс видит свой собственный кэш.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_user_cache(app_configs, **kwargs):
+    """Кэш пользователей должен быть общим для всех процессов."""
+    alias = settings.USER_CACHE_ALIAS
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f'USER_CACHE_ALIAS = {alias!r} использует кэш процесса {backend}.',
+        hint='Укажите общий бэкенд (memcached, redis): иначе после смены '
+             'пароля другие процессы принимают старые сессии до '
+             'USER_CACHE_TIMEOUT.',
+        id='users.E001',
+    )]
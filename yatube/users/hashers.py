@@ -0,0 +1,142 @@
+import base64
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    BasePasswordHasher, PBKDF2PasswordHasher, mask_hash
+)
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import gettext_noop as _
+
+DEFAULT_HASHING_THREADS: int = 2
+DEFAULT_SCRYPT_PARAMS = {'n': 2 ** 14, 'r': 4, 'p': 1}
+
+
+@lru_cache(maxsize=None)
+def hashing_pool():
+    """Общий пул для хеширования: не больше N хешей одновременно.
+
+    scrypt и pbkdf2_hmac отпускают GIL, поэтому остальные потоки
+    процесса продолжают обслуживать запросы, пока идёт хеширование.
+    """
+    return ThreadPoolExecutor(
+        getattr(settings, 'PASSWORD_HASHING_THREADS',
+                DEFAULT_HASHING_THREADS),
+        thread_name_prefix='password-hashing',
+    )
+
+
+def run_in_pool(func, *args, **kwargs):
+    return hashing_pool().submit(func, *args, **kwargs).result()
+
+
+class ScryptPasswordHasher(BasePasswordHasher):
+    """scrypt из стандартной библиотеки.
+
+    Формат хеша совпадает с ScryptPasswordHasher из Django 4.0,
+    так что после обновления Django хеши останутся валидными.
+    """
+
+    algorithm = 'scrypt'
+    maxmem = 0
+
+    @property
+    def params(self):
+        return {**DEFAULT_SCRYPT_PARAMS,
+                **getattr(settings, 'PASSWORD_SCRYPT_PARAMS', {})}
+
+    @property
+    def work_factor(self):
+        return self.params['n']
+
+    @property
+    def block_size(self):
+        return self.params['r']
+
+    @property
+    def parallelism(self):
+        return self.params['p']
+
+    def _scrypt(self, password, salt, work_factor, block_size, parallelism):
+        return run_in_pool(
+            hashlib.scrypt,
+            password.encode(),
+            salt=salt.encode(),
+            n=work_factor,
+            r=block_size,
+            p=parallelism,
+            maxmem=self.maxmem or 256 * work_factor * block_size,
+            dklen=64,
+        )
+
+    def encode(self, password, salt, work_factor=None, block_size=None,
+               parallelism=None):
+        assert password is not None
+        assert salt and '$' not in salt
+        work_factor = work_factor or self.work_factor
+        block_size = block_size or self.block_size
+        parallelism = parallelism or self.parallelism
+        hash_ = base64.b64encode(self._scrypt(
+            password, salt, work_factor, block_size, parallelism,
+        )).decode('ascii')
+        return '%s$%d$%s$%d$%d$%s' % (
+            self.algorithm, work_factor, salt, block_size, parallelism,
+            hash_,
+        )
+
+    def decode(self, encoded):
+        algorithm, work_factor, salt, block_size, parallelism, hash_ = (
+            encoded.split('$', 5))
+        assert algorithm == self.algorithm
+        return {
+            'algorithm': algorithm,
+            'work_factor': int(work_factor),
+            'salt': salt,
+            'block_size': int(block_size),
+            'parallelism': int(parallelism),
+            'hash': hash_,
+        }
+
+    def verify(self, password, encoded):
+        decoded = self.decode(encoded)
+        encoded_2 = self.encode(
+            password,
+            decoded['salt'],
+            decoded['work_factor'],
+            decoded['block_size'],
+            decoded['parallelism'],
+        )
+        return constant_time_compare(encoded, encoded_2)
+
+    def safe_summary(self, encoded):
+        decoded = self.decode(encoded)
+        return OrderedDict([
+            (_('algorithm'), decoded['algorithm']),
+            (_('work factor'), decoded['work_factor']),
+            (_('block size'), decoded['block_size']),
+            (_('parallelism'), decoded['parallelism']),
+            (_('salt'), mask_hash(decoded['salt'])),
+            (_('hash'), mask_hash(decoded['hash'])),
+        ])
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        return (
+            decoded['work_factor'] != self.work_factor
+            or decoded['block_size'] != self.block_size
+            or decoded['parallelism'] != self.parallelism
+        )
+
+    def harden_runtime(self, password, encoded):
+        # Параметры scrypt задают время целиком, выравнивать нечего.
+        pass
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 в том же ограниченном пуле, для старых хешей до обновления."""
+
+    def encode(self, password, salt, iterations=None):
+        return run_in_pool(super().encode, password, salt, iterations)
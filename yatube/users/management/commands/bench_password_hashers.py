@@ -0,0 +1,42 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Пропускная способность проверки паролей (входов в секунду).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=2.0)
+        parser.add_argument(
+            '--threads', type=int, default=os.cpu_count() or 1,
+            help='Число одновременных входов во втором замере.')
+
+    def measure(self, hasher, encoded, threads, seconds):
+        deadline = time.perf_counter() + seconds
+
+        def verify_until_deadline():
+            count = 0
+            while time.perf_counter() < deadline:
+                hasher.verify('password', encoded)
+                count += 1
+            return count
+
+        with ThreadPoolExecutor(threads) as pool:
+            futures = [
+                pool.submit(verify_until_deadline) for _ in range(threads)]
+        return sum(future.result() for future in futures) / seconds
+
+    def handle(self, *args, **options):
+        for hasher in get_hashers()[:2]:
+            encoded = hasher.encode('password', hasher.salt())
+            single = self.measure(hasher, encoded, 1, options['seconds'])
+            parallel = self.measure(
+                hasher, encoded, options['threads'], options['seconds'])
+            self.stdout.write(
+                f'{hasher.algorithm:>14}: {single:.1f} входов/с на ядро, '
+                f'{parallel:.1f} входов/с при {options["threads"]} потоках'
+            )
@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import invalidate_perms, invalidate_user
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_relations_changed(sender, instance, reverse, pk_set, **kwargs):
+    if isinstance(instance, User):
+        invalidate_perms((instance.pk,))
+    else:
+        invalidate_perms(pk_set or ())
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, instance, reverse, **kwargs):
+    if isinstance(instance, Group):
+        invalidate_perms(instance.user_set.values_list('pk', flat=True))
+    else:
+        invalidate_perms(User.objects.filter(
+            groups__permissions=instance).values_list('pk', flat=True))
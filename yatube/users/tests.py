@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (
+    check_password, get_hasher, make_password
+)
+from django.contrib.auth.models import Permission
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .checks import check_user_cache
+
+User = get_user_model()
+
+
+class CachedUserTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='user', password='pass-word1')
+        self.client.login(username='user', password='pass-word1')
+
+    def test_user_is_loaded_from_cache(self):
+        self.client.get(reverse('about:author'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('about:author'))
+        self.assertEqual(response.context['user'], self.user)
+        self.assertFalse(any(
+            'auth_user' in query['sql']
+            for query in queries.captured_queries))
+
+    def test_password_change_ends_session(self):
+        self.client.get(reverse('about:author'))
+        self.user.set_password('new-pass-word2')
+        self.user.save()
+        response = self.client.get(reverse('about:author'))
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_permission_cache_is_invalidated(self):
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(user.has_perm('posts.add_post'))
+        self.user.user_permissions.add(
+            Permission.objects.get(codename='add_post'))
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.has_perm('posts.add_post'))
+
+    def test_process_local_user_cache_fails_deploy_check(self):
+        """Кэш пользователей в памяти процесса не годится для продакшена."""
+        self.assertEqual(
+            [error.id for error in check_user_cache(None)], ['users.E001'])
+        shared = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'users': {
+                'BACKEND':
+                    'django.core.cache.backends.memcached.MemcachedCache'},
+        }
+        with override_settings(CACHES=shared, USER_CACHE_ALIAS='users'):
+            self.assertEqual(check_user_cache(None), [])
+
+
+class PasswordHasherTests(TestCase):
+    def test_new_passwords_use_scrypt(self):
+        encoded = make_password('pass-word1')
+        self.assertTrue(encoded.startswith('scrypt$'))
+        self.assertTrue(check_password('pass-word1', encoded))
+        self.assertFalse(check_password('wrong', encoded))
+
+    def test_old_hash_is_upgraded_on_login(self):
+        user = User.objects.create(
+            username='old',
+            password=make_password('pass-word1', hasher='pbkdf2_sha256'),
+        )
+        self.assertTrue(
+            self.client.login(username='old', password='pass-word1'))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$'))
+
+    def test_scrypt_params_come_from_settings(self):
+        encoded = make_password('pass-word1')
+        params = {'n': 2 ** 12, 'r': 8, 'p': 1}
+        with override_settings(PASSWORD_SCRYPT_PARAMS=params):
+            hasher = get_hasher('scrypt')
+            self.assertTrue(hasher.must_update(encoded))
+            self.assertTrue(
+                make_password('pass-word1').startswith('scrypt$4096$'))
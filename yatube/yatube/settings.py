@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'about.apps.AboutConfig',
     'core.apps.CoreConfig',
+    'taskqueue.apps.TaskQueueConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -51,34 +52,52 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.static.StaticFilesMiddleware',
+    'core.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
+# Шаблоны минифицируются при загрузке; вне DEBUG ещё и кэшируются
+# скомпилированными, так что минификация идёт раз на процесс.
+TEMPLATE_LOADERS = [
+    'core.template_loaders.FilesystemLoader',
+    'core.template_loaders.AppDirectoriesLoader',
+]
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS if DEBUG else [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'posts.context_processors.notifications',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# yatube.asgi: сколько потоков одновременно выполняют запросы Django.
+# Медленные клиенты потоков не занимают, поэтому пул может быть небольшим.
+ASGI_THREADS = 8
+# Предел тела запроса под ASGI: больше — 413 до передачи в Django.
+# С запасом над UPLOAD_MAX_SIZE для формы поста с картинкой.
+ASGI_MAX_BODY_SIZE = 25 * 1024 * 1024
 
 
 # Database
@@ -92,6 +111,55 @@ DATABASES = {
 }
 
 
+# Ограничение частоты запросов: корзина на пользователя, а для анонимов —
+# на IP. Корзины хранятся в кэше RATELIMIT_CACHE_ALIAS; None — в памяти
+# процесса.
+RATELIMIT_CACHE_ALIAS = 'default'
+# За обратным прокси IP клиента берётся из этого заголовка, например
+# 'HTTP_X_FORWARDED_FOR', с учётом числа доверенных прокси перед
+# приложением. None — REMOTE_ADDR.
+RATELIMIT_IP_HEADER = None
+RATELIMIT_TRUSTED_PROXIES = 1
+RATELIMITS = {
+    'posts:post_create': {'rate': '20/m', 'methods': ('POST',)},
+    'posts:post_edit': {'rate': '30/m', 'methods': ('POST',)},
+    'posts:add_comment': {'rate': '30/m', 'methods': ('POST',)},
+    'posts:profile_follow': {'rate': '60/m'},
+    'posts:profile_unfollow': {'rate': '60/m'},
+    'posts:follow_bulk': {'rate': '10/m'},
+    'posts:upload_start': {'rate': '20/m'},
+    'users:signup': {'rate': '10/h', 'methods': ('POST',)},
+}
+
+# Сжатие ответов: меньше COMPRESSION_MIN_SIZE байт не сжимаем, сжатые
+# варианты кэшируемых страниц хранятся в COMPRESSION_CACHE_ALIAS.
+COMPRESSION_MIN_SIZE = 200
+COMPRESSION_CACHE_ALIAS = 'default'
+
+# Кэш Atom-лент и отметок их обновления. При нескольких процессах нужен
+# общий бэкенд (memcached, redis): новый пост сбрасывает отметку только в
+# этом кэше, и с кэшем процесса остальные отдают старую ленту (и 304) до
+# истечения FEED_CACHE_TIMEOUT.
+FEED_CACHE_ALIAS = 'default'
+
+
+# Уведомления: раз в период (cron, send_notification_digests) каждому
+# уходит одно письмо со всеми непрочитанными событиями.
+NOTIFICATION_EMAIL_DIGEST = True
+# Адрес сайта для ссылок в письмах, которые уходят вне запроса.
+SITE_URL = 'http://localhost:8000'
+
+# Живые обновления (Server-Sent Events). Включать, только если сайт
+# обслуживает yatube.asgi: под WSGI каждое открытое соединение занимает
+# рабочий поток. LocalBackend — для одного узла; при нескольких узлах —
+# core.pubsub.CacheBackend с общим кэшем.
+LIVE_UPDATES = False
+PUBSUB_BACKEND = {'BACKEND': 'core.pubsub.LocalBackend'}
+SSE_MAX_DURATION = 55
+SSE_KEEPALIVE = 15
+SSE_RETRY_MS = 3000
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -111,6 +179,24 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Первый хешер используется для новых паролей; хеши остальных при входе
+# прозрачно перехешируются первым. Хеширование идёт в пуле
+# из PASSWORD_HASHING_THREADS потоков на процесс.
+PASSWORD_HASHERS = [
+    'users.hashers.ScryptPasswordHasher',
+    'users.hashers.PooledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+PASSWORD_HASHING_THREADS = 2
+# n * r * 128 байт памяти на хеш (здесь 8 МБ). При r=4 scrypt проверяет
+# пароль примерно вдвое быстрее PBKDF2 с 150 000 итераций
+# (manage.py bench_password_hashers); смена параметров перехеширует
+# пароли при следующем входе.
+PASSWORD_SCRYPT_PARAMS = {'n': 2 ** 14, 'r': 4, 'p': 1}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
 
@@ -130,17 +216,78 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+# В продакшене collectstatic кладёт файлы с хешем в имени и .gz/.br копии;
+# в DEBUG манифеста нет, поэтому остаётся обычное хранилище.
+if not DEBUG:
+    STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+# Раздавать STATIC_ROOT из процесса, если перед ним нет nginx.
+SERVE_STATIC = not DEBUG
+
+# Пользователь и его права берутся из кэша, а не из auth_user на каждый запрос.
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма уходят в очередь задач, воркер отправляет их через
+# QUEUED_EMAIL_BACKEND (локально — в файлы в EMAIL_FILE_PATH).
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+QUEUED_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Какие каталоги MEDIA_ROOT отдаёт core.media.serve_media.
+MEDIA_SERVE_PREFIXES = ('posts/', 'cache/')
+# None — отдавать файл самим; 'X-Accel-Redirect' (nginx) или 'X-Sendfile'
+# (Apache, lighttpd) — передать отдачу прокси.
+MEDIA_SENDFILE = None
+# internal-location nginx, указывающий на MEDIA_ROOT.
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Загрузка картинок по частям: куда собирать файл, пределы и срок жизни.
+UPLOAD_TEMP_DIR = os.path.join(BASE_DIR, 'uploads_tmp')
+UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_EXPIRE = 24 * 60 * 60
+# Предел JSON-тела массовой подписки; большие списки — потоком NDJSON.
+FOLLOW_BULK_MAX_SIZE = 256 * 1024
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    # Отдельный кэш для сессий, чтобы cache.clear() не разлогинивал всех.
+    # При нескольких процессах нужен общий бэкенд (memcached, redis):
+    # иначе выход из аккаунта не сбросит сессию в кэше других процессов.
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    },
 }
+# Сессии: чтение из кэша, запись сразу в кэш и в БД (write-through).
+# Другие варианты:
+#   'django.contrib.sessions.backends.signed_cookies' — без БД и кэша,
+#     но выход не отзывает уже выданную куку;
+#   'django.contrib.sessions.backends.db' — запрос к БД на каждый запрос.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+# Кэш пользователей и прав (users.backends). Как и кэш сессий, при
+# нескольких процессах он должен быть общим: check --deploy это проверяет.
+USER_CACHE_ALIAS = 'sessions'
+
+# Размер страницы для каждой ленты; ?limit= не может превысить максимум.
+POSTS_PER_PAGE = {
+    'index': 10,
+    'group_list': 10,
+    'profile': 10,
+    'follow_index': 10,
+    'trending': 10,
+    'archive': 10,
+    'notifications': 20,
+}
+POSTS_MAX_PER_PAGE = 50
+# Вместе со страницей N выбирать страницу N+1 и класть её в кэш.
+POSTS_PREFETCH_NEXT_PAGE = True
+
+# Выполнять задачи очереди сразу, без воркера (manage.py run_tasks).
+TASKS_ALWAYS_EAGER = False
@@ -16,7 +16,8 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core.media import serve_media
 
 urlpatterns = [
     # импорт правил из приложения posts
@@ -29,7 +30,8 @@ urlpatterns = [
 
 handler404 = 'core.views.page_not_found'
 handler403 = 'core.views.csrf_failure'
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
+if settings.MEDIA_URL.startswith('/'):
+    urlpatterns.append(
+        path(f'{settings.MEDIA_URL[1:]}<path:path>', serve_media,
+             name='media')
     )